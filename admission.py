@@ -0,0 +1,215 @@
+"""Admission control and per-user fair queueing for agent runs.
+
+A ReAct run can take over a minute of embedding CPU and Gemini quota, so
+only ``NYAYA_MAX_CONCURRENT_AGENTS`` run at once. Everyone else waits in a
+per-user queue; free slots are handed out round-robin across users, so one
+user firing several questions cannot starve the others. Queues are bounded
+(``NYAYA_MAX_QUEUE`` overall, ``NYAYA_MAX_QUEUE_PER_USER`` per user) and
+requests over the bound are shed immediately with an estimated retry time.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+MAX_CONCURRENT = int(os.environ.get("NYAYA_MAX_CONCURRENT_AGENTS", "4"))
+MAX_QUEUE = int(os.environ.get("NYAYA_MAX_QUEUE", "32"))
+MAX_QUEUE_PER_USER = int(os.environ.get("NYAYA_MAX_QUEUE_PER_USER", "2"))
+MAX_WAIT_S = float(os.environ.get("NYAYA_MAX_QUEUE_WAIT_S", "180"))
+# Starting guess for the service-time EWMA until real runs are observed
+INITIAL_SERVICE_S = 20.0
+
+
+class QueueFull(Exception):
+    """Raised when a request is shed; ``retry_after`` is a rough wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """Raised when a queued request waited longer than ``MAX_WAIT_S``."""
+
+
+class _Ticket:
+    __slots__ = ("user", "enqueued", "granted", "started")
+
+    def __init__(self, user: str):
+        self.user = user
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.started = None
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, max_queue: int = MAX_QUEUE,
+                 max_queue_per_user: int = MAX_QUEUE_PER_USER, max_wait_s: float = MAX_WAIT_S):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait_s = max_wait_s
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queues = {}       # user -> deque of waiting tickets
+        self._turns = deque()   # users with waiting tickets, in round-robin order
+        self._queued = 0
+        self._service_ewma = INITIAL_SERVICE_S
+        self._counters = {
+            "admitted_total": 0,
+            "queued_total": 0,
+            "shed_total": 0,
+            "timed_out_total": 0,
+            "completed_total": 0,
+        }
+        self._wait_total = 0.0
+
+    # -- queue bookkeeping (call with the condition held) -------------------
+
+    def _grant_next(self):
+        while self._running < self.max_concurrent and self._turns:
+            user = self._turns.popleft()
+            queue = self._queues[user]
+            ticket = queue.popleft()
+            if queue:
+                self._turns.append(user)
+            else:
+                del self._queues[user]
+            self._queued -= 1
+            self._grant(ticket)
+        self._cond.notify_all()
+
+    def _grant(self, ticket: _Ticket):
+        ticket.granted = True
+        ticket.started = time.monotonic()
+        self._running += 1
+        self._counters["admitted_total"] += 1
+        self._wait_total += ticket.started - ticket.enqueued
+
+    def _remove(self, ticket: _Ticket):
+        queue = self._queues.get(ticket.user)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self._queued -= 1
+        if not queue:
+            del self._queues[ticket.user]
+            self._turns.remove(ticket.user)
+
+    def _position(self, ticket: _Ticket) -> int:
+        """1-based estimate of how many grants happen before (and including) this one."""
+        if ticket.granted:
+            return 0
+        queue = self._queues.get(ticket.user)
+        if queue is None:
+            return 0
+        depth = queue.index(ticket)
+        pos = depth + 1
+        for user in self._turns:
+            if user == ticket.user:
+                continue
+            # Users ahead in the rotation get one extra grant in our final round
+            ahead = self._turns.index(user) < self._turns.index(ticket.user)
+            pos += min(len(self._queues[user]), depth + (1 if ahead else 0))
+        return pos
+
+    def _eta(self, position: int) -> float:
+        return position * self._service_ewma / self.max_concurrent
+
+    # -- public API ----------------------------------------------------------
+
+    def submit(self, user: str) -> _Ticket:
+        """Admit or enqueue a request for ``user``; raises ``QueueFull`` if shed."""
+        with self._cond:
+            ticket = _Ticket(user)
+            if self._running < self.max_concurrent and not self._turns:
+                self._grant(ticket)
+                return ticket
+            user_queue = self._queues.get(user)
+            if self._queued >= self.max_queue or (user_queue and len(user_queue) >= self.max_queue_per_user):
+                self._counters["shed_total"] += 1
+                retry = self._eta(self._queued + 1)
+                raise QueueFull("The assistant is busy right now. Please try again shortly.", retry)
+            if user_queue is None:
+                user_queue = self._queues[user] = deque()
+                self._turns.append(user)
+            user_queue.append(ticket)
+            self._queued += 1
+            self._counters["queued_total"] += 1
+            return ticket
+
+    def status(self, ticket: _Ticket) -> tuple:
+        """``(position, eta_seconds)`` for a waiting ticket, ``(0, 0)`` once granted."""
+        with self._cond:
+            pos = self._position(ticket)
+            return pos, self._eta(pos)
+
+    def wait(self, ticket: _Ticket, on_wait=None, poll_s: float = 1.0):
+        """Block until ``ticket`` is granted, calling ``on_wait(position, eta)`` while queued."""
+        deadline = ticket.enqueued + self.max_wait_s
+        with self._cond:
+            while not ticket.granted:
+                if time.monotonic() >= deadline:
+                    self._remove(ticket)
+                    self._counters["timed_out_total"] += 1
+                    raise QueueTimeout("Your question waited too long in the queue. Please try again.")
+                if on_wait is not None:
+                    pos = self._position(ticket)
+                    eta = self._eta(pos)
+                    self._cond.release()
+                    try:
+                        on_wait(pos, eta)
+                    finally:
+                        self._cond.acquire()
+                    if ticket.granted:
+                        break
+                self._cond.wait(timeout=min(poll_s, max(0.0, deadline - time.monotonic())))
+
+    def release(self, ticket: _Ticket):
+        with self._cond:
+            if not ticket.granted:
+                self._remove(ticket)
+                return
+            elapsed = time.monotonic() - ticket.started
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * elapsed
+            self._running -= 1
+            self._counters["completed_total"] += 1
+            self._grant_next()
+
+    def run(self, user: str, fn, *args, on_wait=None, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once admitted; see ``submit`` and ``wait``."""
+        ticket = self.submit(user)
+        try:
+            self.wait(ticket, on_wait=on_wait)
+            return fn(*args, **kwargs)
+        finally:
+            self.release(ticket)
+
+    def metrics(self) -> dict:
+        with self._cond:
+            admitted = self._counters["admitted_total"]
+            return {
+                "running": self._running,
+                "max_concurrent": self.max_concurrent,
+                "queued": self._queued,
+                "queued_users": len(self._queues),
+                "max_queue": self.max_queue,
+                "avg_wait_s": round(self._wait_total / admitted, 3) if admitted else 0.0,
+                "service_ewma_s": round(self._service_ewma, 3),
+                **self._counters,
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller() -> AdmissionController:
+    """Process-wide controller shared by all Streamlit sessions."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
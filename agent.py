@@ -1,8 +1,19 @@
+# Thread budget first: the imports below pull in torch and faiss
+from tools import thread_budget
+thread_budget.configure_env()
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain_core.output_parsers import StrOutputParser
 from tools.react_prompt_template import get_prompt_template
-from tools.pdf_query_tools import indian_constitution_pdf_query, indian_laws_pdf_query
+from tools.scratchpad import create_compact_react_agent
+from tools.pdf_query_tools import CORPORA, get_tools, _embed_queries, _format_passages, _chunk_id
+from tools import query_log
+from cachetools import TTLCache
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import warnings
 import time
 
@@ -10,24 +21,40 @@ import time
 _cached_llm = None
 _cached_agent_executor = None
 
+# Set NYAYA_COMPACT_SCRATCHPAD=0 to resend full observations every iteration
+COMPACT_SCRATCHPAD = os.environ.get("NYAYA_COMPACT_SCRATCHPAD", "1").lower() not in ("0", "false", "no")
+
+# Final answers keyed by normalized query; legal text changes rarely, but
+# keep entries bounded in age so prompt/model changes roll out
+ANSWER_CACHE_TTL_S = float(os.environ.get("NYAYA_ANSWER_CACHE_TTL_S", str(24 * 3600)))
+_answer_lock = threading.Lock()
+_answer_cache = TTLCache(maxsize=int(os.environ.get("NYAYA_ANSWER_CACHE_SIZE", "512")), ttl=ANSWER_CACHE_TTL_S)
+
+def _build_llm():
+    """LLM used by the agent; benchmarks swap this for an offline stub."""
+    # Use Google Gemini for cloud LLM
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash",
+        temperature=0.3,
+        timeout=30
+    )
+
+
 def _get_agent_executor():
     """Get or create cached agent executor."""
     global _cached_llm, _cached_agent_executor
     
     if _cached_agent_executor is None:
         warnings.filterwarnings("ignore", category=FutureWarning)
+        thread_budget.apply()
         
-        # Use Google Gemini for cloud LLM
-        _cached_llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.3,
-            timeout=30
-        )
+        _cached_llm = _build_llm()
         
-        tools = [indian_constitution_pdf_query, indian_laws_pdf_query]
+        tools = get_tools()
         prompt_template = get_prompt_template()
         
-        agent = create_react_agent(
+        build_agent = create_compact_react_agent if COMPACT_SCRATCHPAD else create_react_agent
+        agent = build_agent(
             _cached_llm,
             tools,
             prompt_template
@@ -45,7 +72,67 @@ def _get_agent_executor():
     return _cached_agent_executor
 
 
+def _synthesis_prompt(q: str, context: str) -> str:
+    return (
+        "You are a legal assistant for Indian law. Using ONLY the provided excerpts, "
+        "answer the user's question clearly. If information is insufficient, say so.\n\n" \
+        f"Question: {q}\n\nExcerpts:\n{context}\n\nAnswer:" )
+
+
+def prime_answer_cache(query: str, answer: str, ts: float = None):
+    """Seed the answer cache (used by log-driven warmup); stale answers are skipped."""
+    if ts is not None and time.time() - ts > ANSWER_CACHE_TTL_S:
+        return
+    with _answer_lock:
+        _answer_cache[query_log.normalize(query)] = answer
+
+
+def cached_answer(query: str):
+    """
+    Answer for ``query`` from the answer cache, or None.
+
+    Callers check this before queueing for a full agent run, so cache hits
+    never wait behind ReAct runs. A hit is recorded in the query log.
+
+    Args:
+        query (str): The user's query
+    """
+    with _answer_lock:
+        cached = _answer_cache.get(query_log.normalize(query))
+    if cached is not None:
+        query_log.begin(query)
+        query_log.note(route="answer_cache", cache="answer")
+        query_log.finish(cached)
+    return cached
+
+
 def agent(query: str):
+    """
+    Answer a query, serving repeated questions from the answer cache.
+
+    Every call is recorded in the structured query log.
+
+    Args:
+        query (str): The user's query
+    """
+    cached = cached_answer(query)
+    if cached is not None:
+        return cached
+
+    query_log.begin(query)
+    key = query_log.normalize(query)
+    answer = None
+    try:
+        answer = _run_agent(query)
+        if query_log.current_route() in ("agent", "fallback"):
+            with _answer_lock:
+                _answer_cache[key] = answer
+        return answer
+    finally:
+        query_log.finish(answer)
+
+
+def _run_agent(query: str):
     """
     Create and run an agent with Google Gemini LLM
     
@@ -57,18 +144,15 @@ def agent(query: str):
 
     def _fallback_synthesis(q: str):
         try:
-            from tools.pdf_query_tools import indian_constitution_pdf_query, indian_laws_pdf_query
-            const_passages = indian_constitution_pdf_query(q)
-            law_passages = indian_laws_pdf_query(q)
-            context = f"Constitution References:\n{const_passages}\n\nLaw References:\n{law_passages}"[:6000]
+            context = "\n\n".join(
+                f"{corpus.title} References:\n{corpus.query(q)}" for corpus in CORPORA.values()
+            )[:6000]
             synthesis_llm = _cached_llm or ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.2)
-            prompt = (
-                "You are a legal assistant for Indian law. Using ONLY the provided excerpts, "
-                "answer the user's question clearly. If information is insufficient, say so.\n\n" \
-                f"Question: {q}\n\nExcerpts:\n{context}\n\nAnswer:" )
-            answer = synthesis_llm.invoke(prompt)
+            answer = synthesis_llm.invoke(_synthesis_prompt(q, context))
+            query_log.note(route="fallback")
             return getattr(answer, "content", str(answer))
         except Exception:
+            query_log.note(route="error")
             return (
                 "The agent stopped early and the fallback also failed. "
                 "Please try rephrasing your question or narrow its scope."
@@ -87,6 +171,7 @@ def agent(query: str):
             return _fallback_synthesis(query)
         return output
     except TimeoutError:
+        query_log.note(route="error")
         return "Sorry, the query took too long to process. Please try a simpler question or rephrase it."
     except Exception as e:
         elapsed = time.time() - start_time
@@ -98,8 +183,116 @@ def agent(query: str):
         if any(tp.lower() in msg.lower() for tp in trigger_phrases):
             return _fallback_synthesis(query)
 
+        query_log.note(route="error")
         if "timeout" in msg.lower():
             return "The query timed out. Please try asking a more specific question."
         if any(w in msg.lower() for w in ["rate", "quota"]):
             return "API rate limit reached. Please wait a moment and try again."
-        return "Sorry, I encountered an error while processing your query. Please try rephrasing it."
\ No newline at end of file
+        return "Sorry, I encountered an error while processing your query. Please try rephrasing it."
+
+
+def _load_done_ids(out_path: str) -> set:
+    """IDs already written to ``out_path`` by an earlier (possibly interrupted) run."""
+    done = set()
+    try:
+        with open(out_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                if record.get("error") is None:
+                    done.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _iter_batches(queries, batch_size: int):
+    batch = []
+    for i, item in enumerate(queries):
+        if isinstance(item, dict):
+            item = {"id": str(item.get("id", i)), "query": item["query"]}
+        else:
+            item = {"id": str(i), "query": str(item)}
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def agent_batch(queries, out_path: str, concurrency: int = 4, batch_size: int = 64) -> dict:
+    """
+    Answer many queries offline (evaluation runs, FAQ precomputation).
+
+    Unlike ``agent``, each query gets one retrieve-then-synthesize pass
+    rather than a ReAct loop, which is what makes batching possible: each
+    batch is embedded in one model call, searched with one FAISS call per
+    corpus, and synthesized by at most ``concurrency`` parallel Gemini
+    calls. Results are appended to ``out_path`` as JSONL as they finish;
+    that file is also the checkpoint, so rerunning with the same
+    ``out_path`` skips queries that already succeeded.
+
+    Args:
+        queries: list or iterable of strings, or dicts with "query" and optional "id"
+        out_path (str): JSONL file for results
+        concurrency (int): maximum parallel LLM calls
+        batch_size (int): queries embedded and searched together
+
+    Returns:
+        dict with counts of completed, skipped and failed queries
+    """
+    done = _load_done_ids(out_path)
+    llm = _cached_llm or _build_llm()
+    stats = {"completed": 0, "skipped": 0, "failed": 0}
+
+    def synthesize(item, context):
+        t0 = time.time()
+        record = {"id": item["id"], "query": item["query"], "answer": None, "error": None}
+        try:
+            answer = llm.invoke(_synthesis_prompt(item["query"], context))
+            record["answer"] = getattr(answer, "content", str(answer))
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round(1000 * (time.time() - t0), 1)
+        return record
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    # Terminate a torn last line so appended records stay one per line
+    if os.path.exists(out_path) and os.path.getsize(out_path):
+        with open(out_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in _iter_batches(queries, batch_size):
+            todo = [item for item in batch if item["id"] not in done]
+            stats["skipped"] += len(batch) - len(todo)
+            if not todo:
+                continue
+
+            texts = [item["query"] for item in todo]
+            vectors = _embed_queries(texts)
+            contexts = ["" for _ in todo]
+            passages = [{} for _ in todo]
+            for corpus in CORPORA.values():
+                for i, docs in enumerate(corpus.search_batch(texts, vectors)):
+                    contexts[i] += f"{corpus.title} References:\n{_format_passages(docs)}\n\n"
+                    passages[i][corpus.name] = [_chunk_id(d) for d in docs]
+
+            futures = [
+                pool.submit(synthesize, item, context[:6000])
+                for item, context in zip(todo, contexts)
+            ]
+            for future, chunk_ids in zip(futures, passages):
+                record = future.result()
+                record["passages"] = chunk_ids
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                stats["failed" if record["error"] else "completed"] += 1
+            print(f"Batch done: {stats['completed']} completed, {stats['failed']} failed, {stats['skipped']} skipped")
+    return stats
@@ -1,4 +1,3 @@
-from langchain_core.messages import HumanMessage, AIMessage
 import os
 import json
 import base64
@@ -10,7 +9,11 @@ from dotenv import dotenv_values
 import streamlit as st
 import streamlit.components.v1 as components
 import jwt
-from agent import agent
+import startup
+import admission
+from chat_store import ChatStore
+
+_run_started = time.perf_counter()
 
 # ============================================================================
 # User Storage Configuration
@@ -173,23 +176,26 @@ def _merged_env():
         "PASSWORD_SALT": pick("PASSWORD_SALT", "nyaya-salt"),
     }
 
-ENVs = _merged_env()
-GOOGLE_API_KEY = ENVs.get("GOOGLE_API_KEY", "")
+def _bootstrap() -> dict:
+    """Config from .env and secrets, read once per session instead of every rerun."""
+    envs = _merged_env()
+    config = {
+        "GOOGLE_API_KEY": envs.get("GOOGLE_API_KEY", ""),
+        "GITHUB_TOKEN": envs.get("GITHUB_TOKEN"),
+        "GITHUB_REPO": envs.get("GITHUB_REPO") or "harshita-8605/Nyaya-bot",
+        "GITHUB_BRANCH": envs.get("GITHUB_BRANCH") or "main",
+        "JWT_SECRET": envs.get("JWT_SECRET") or envs.get("GOOGLE_API_KEY") or "dev-insecure-secret",
+        "PASSWORD_SALT": envs.get("PASSWORD_SALT") or "nyaya-salt",
+    }
+    # Set environment variables
+    if config["GOOGLE_API_KEY"]:
+        os.environ["GOOGLE_API_KEY"] = config["GOOGLE_API_KEY"]
+    if envs.get("HUGGINGFACE_API_KEY"):
+        os.environ["HUGGINGFACE_API_KEY"] = envs["HUGGINGFACE_API_KEY"]
+    return config
+
 
-# Inject optional secrets
-GITHUB_TOKEN = ENVs.get("GITHUB_TOKEN")
-GITHUB_REPO = ENVs.get("GITHUB_REPO") or "harshita-8605/Nyaya-bot"
-GITHUB_BRANCH = ENVs.get("GITHUB_BRANCH") or "main"
-JWT_SECRET = ENVs.get("JWT_SECRET") or ENVs.get("GOOGLE_API_KEY") or "dev-insecure-secret"
-PASSWORD_SALT = ENVs.get("PASSWORD_SALT") or "nyaya-salt"
-
-# Set environment variables
-if GOOGLE_API_KEY:
-    os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
-if ENVs.get("HUGGINGFACE_API_KEY"):
-    os.environ["HUGGINGFACE_API_KEY"] = ENVs["HUGGINGFACE_API_KEY"]
-
-# Configure Streamlit
+# Configure Streamlit (must precede any other st call; reading secrets can render an error)
 st.set_page_config(
     page_title="Nyaya-BOT👩‍⚖️",
     page_icon="⚖️",
@@ -197,6 +203,28 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# session_state, not st.cache_resource: that decorator re-hashes the function
+# source on every rerun, which costs more than the read it saves
+if "config" not in st.session_state:
+    st.session_state.config = _bootstrap()
+ENVs = st.session_state.config
+GOOGLE_API_KEY = ENVs["GOOGLE_API_KEY"]
+
+# Inject optional secrets
+GITHUB_TOKEN = ENVs["GITHUB_TOKEN"]
+GITHUB_REPO = ENVs["GITHUB_REPO"]
+GITHUB_BRANCH = ENVs["GITHUB_BRANCH"]
+JWT_SECRET = ENVs["JWT_SECRET"]
+PASSWORD_SALT = ENVs["PASSWORD_SALT"]
+
+# Server-side time per script run / chat fragment run, printed to the server log
+RERUN_TIMING = os.environ.get("NYAYA_RERUN_TIMING") == "1"
+
+
+def _log_rerun(scope: str, started: float):
+    if RERUN_TIMING:
+        print(f"⏱️ {scope} rerun: {1000 * (time.perf_counter() - started):.1f} ms")
+
 # ============================================================================
 # Session State Initialization (persists across page refreshes)
 # ============================================================================
@@ -209,39 +237,45 @@ if "username" not in st.session_state:
     st.session_state.username = None
 if "show_register" not in st.session_state:
     st.session_state.show_register = False
-if "store" not in st.session_state:
-    st.session_state.store = []
+if "chat" not in st.session_state:
+    st.session_state.chat = None
+if "auth_restore_done" not in st.session_state:
+    st.session_state.auth_restore_done = False
 # ============================================================================
 
-# Attempt to restore session from localStorage via query param token
-components.html(
-        """
-        <script>
-        try {
-            const t = localStorage.getItem('nyaya_jwt');
-            const url = new URL(window.location.href);
-            if (t && !url.searchParams.get('token')) {
-                url.searchParams.set('token', t);
-                window.location.replace(url.toString());
-            }
-        } catch (e) {}
-        </script>
-        """,
-        height=0,
-)
+# Attempt to restore session from localStorage via query param token. This
+# only has to happen on the first run of a browser session, not on every rerun.
+if not st.session_state.auth_restore_done:
+    st.session_state.auth_restore_done = True
+    if st.session_state.auth_token is None:
+        components.html(
+            """
+            <script>
+            try {
+                const t = localStorage.getItem('nyaya_jwt');
+                const url = new URL(window.location.href);
+                if (t && !url.searchParams.get('token')) {
+                    url.searchParams.set('token', t);
+                    window.location.replace(url.toString());
+                }
+            } catch (e) {}
+            </script>
+            """,
+            height=0,
+        )
 
-try:
-        qp = st.experimental_get_query_params()
-        tkn = (qp.get("token") or [None])[0]
-        if tkn and st.session_state.auth_token is None:
+        try:
+            qp = st.experimental_get_query_params()
+            tkn = (qp.get("token") or [None])[0]
+            if tkn:
                 uname = _verify_jwt(tkn)
                 if uname:
-                        st.session_state.auth_token = tkn
-                        st.session_state.username = uname
-                        # Clear token from URL
-                        st.experimental_set_query_params()
-except Exception:
-        pass
+                    st.session_state.auth_token = tkn
+                    st.session_state.username = uname
+                    # Clear token from URL
+                    st.experimental_set_query_params()
+        except Exception:
+            pass
 
 # ============================================================================
 # Authentication Functions
@@ -304,7 +338,7 @@ def logout():
     """Clear authentication and reset session."""
     st.session_state.auth_token = None
     st.session_state.username = None
-    st.session_state.store = []
+    st.session_state.chat = None
     # Clear token from browser
     components.html("<script>localStorage.removeItem('nyaya_jwt');</script>", height=0)
     st.rerun()
@@ -381,6 +415,7 @@ if st.session_state.auth_token is None:
         st.markdown("---")
         st.caption("Don't have an account? Click 'Register' above")
     
+    _log_rerun("login page", _run_started)
     st.stop()  # Stop execution here if not authenticated
 
 # ============================================================================
@@ -389,6 +424,10 @@ if st.session_state.auth_token is None:
 
 st.title("Nyaya-BOT⚖️")
 
+# Heavy imports (LangChain, torch, FAISS) are kept off the login screen; this is
+# a no-op when startup.py already began warming the process.
+startup.start_background_warmup()
+
 # Sidebar for settings
 with st.sidebar:
     st.header("Configuration⚙️")
@@ -397,6 +436,8 @@ with st.sidebar:
     st.subheader("👤 User Session")
     st.write(f"**Logged in as:** {st.session_state.username}")
     st.write("🟢 **Status:** Authenticated")
+    if not startup.is_ready():
+        st.caption("⏳ Legal indexes are still loading; the first answer may be slower.")
     
     if st.button("🚪 Logout", use_container_width=True):
         logout()
@@ -407,6 +448,8 @@ with st.sidebar:
     st.subheader("Current Config:")
     st.write(f"**Provider:** Google Gemini (Cloud)")
     st.write(f"**Model:** gemini-2.5-flash")
+    queue = admission.get_controller().metrics()
+    st.caption(f"Active queries: {queue['running']}/{queue['max_concurrent']} · Queued: {queue['queued']}")
 
 # Main content
 initial_msg = """
@@ -416,51 +459,89 @@ initial_msg = """
 """
 st.markdown(initial_msg)
 
-# Use store from session state (already initialized above)
-store = st.session_state.store
+# The chat area reruns on its own: sending a message or paging history does
+# not re-execute the bootstrap, auth gate and sidebar above.
+_fragment = getattr(st, "fragment", None) or st.experimental_fragment
+
+
+@_fragment
+def chat_area():
+    started = time.perf_counter()
+    # Bounded chat history: recent window in memory, the rest paged from disk
+    chat = st.session_state.chat
+    if chat is None or chat.username != st.session_state.username:
+        chat = st.session_state.chat = ChatStore(st.session_state.username)
+
+    if chat.has_more:
+        older_slot = st.empty()
+        if not chat.at_cap and older_slot.button("⬆️ Load earlier messages", use_container_width=True):
+            chat.load_older()
+        if chat.at_cap:
+            older_slot.caption("📜 Earlier messages are saved, but this session already shows as much history as it can hold.")
+        elif not chat.has_more:
+            older_slot.empty()
+
+    # Display chat history (only the loaded window is drawn on each rerun)
+    for message in chat.messages():
+        if message["type"] == "ai":
+            avatar = "👩‍⚖️"
+        else:
+            avatar = "🗨️"
+        with st.chat_message(message["type"], avatar=avatar):
+            st.markdown(message["content"])
+
+    # Chat input
+    if prompt := st.chat_input("What is your query?"):
+        # Display user message
+        st.chat_message("user", avatar="🗨️").markdown(prompt)
+
+        # Show detailed thinking message with progress
+        thinking_placeholder = st.chat_message("assistant", avatar="⚖️")
+
+        with thinking_placeholder:
+            with st.spinner("🔍 Analyzing your query..."):
+                # Add user message to store
+                chat.append("human", prompt)
+
+                try:
+                    # Check if Google API key is available
+                    if not GOOGLE_API_KEY:
+                        response_content = "Sorry, no API key found for Google Gemini. Please set GOOGLE_API_KEY in your .env file."
+                    else:
+                        # Answer-cache hits return at once instead of queueing behind agent runs
+                        response_content = startup.cached_answer(prompt)
+                    if response_content is None:
+                        # Bounded concurrency with a fair per-user queue
+                        queue_note = st.empty()
+
+                        def _on_wait(position, eta):
+                            queue_note.info(f"⏳ You are #{position} in the queue (about {eta:.0f}s).")
 
-# Display chat history
-for message in store:
-    if message.type == "ai":
-        avatar = "👩‍⚖️"
-    else:
-        avatar = "🗨️"
-    with st.chat_message(message.type, avatar=avatar):
-        st.markdown(message.content)
-
-# Chat input
-if prompt := st.chat_input("What is your query?"):
-    # Display user message
-    st.chat_message("user", avatar="🗨️").markdown(prompt)
-    
-    # Show detailed thinking message with progress
-    thinking_placeholder = st.chat_message("assistant", avatar="⚖️")
-    
-    with thinking_placeholder:
-        with st.spinner("🔍 Analyzing your query..."):
-            # Add user message to store
-            store.append(HumanMessage(content=prompt))
-            
-            try:
-                # Check if Google API key is available
-                if not GOOGLE_API_KEY:
-                    response_content = "Sorry, no API key found for Google Gemini. Please set GOOGLE_API_KEY in your .env file."
-                else:
-                    response_content = agent(prompt)
-                
-                response = AIMessage(content=response_content)
-                
-            except Exception as e:
-                error_msg = f"Sorry, I encountered an error: {str(e)}"
-                if "API" in str(e).upper():
-                    error_msg += "\n\nThis might be due to API limits or network issues."
-                response = AIMessage(content=error_msg)
-            
-            # Add response to store
-            store.append(response)
-    
-    # Update with final response
-    thinking_placeholder.markdown(response.content)
+                        response_content = admission.get_controller().run(
+                            st.session_state.username, startup.get_agent(), prompt, on_wait=_on_wait
+                        )
+                        queue_note.empty()
+
+                except admission.QueueFull as e:
+                    response_content = f"⏳ {e} Estimated wait: about {e.retry_after:.0f} seconds."
+                except admission.QueueTimeout as e:
+                    response_content = f"⏳ {e}"
+                except Exception as e:
+                    error_msg = f"Sorry, I encountered an error: {str(e)}"
+                    if "API" in str(e).upper():
+                        error_msg += "\n\nThis might be due to API limits or network issues."
+                    response_content = error_msg
+
+                # Add response to store
+                chat.append("ai", response_content)
+
+        # Update with final response; earlier messages are not redrawn here
+        thinking_placeholder.markdown(response_content)
+
+    _log_rerun("chat fragment", started)
+
+
+chat_area()
 
 # Footer
 st.markdown("---")
@@ -471,4 +552,6 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True,
-)
\ No newline at end of file
+)
+
+_log_rerun("script", _run_started)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Replay a JSONL request log against the agent or the retrieval tools.
+
+Each log line is ``{"query": "...", "user": "..."}``. Requests arrive at a
+fixed Poisson rate (``--rate``, 0 = back to back) and are served by
+``--concurrency`` workers. Unless ``--real-llm`` is given, Gemini is
+replaced by a deterministic ReAct stub so runs work offline and measure our
+own overhead; retrieval still uses the real embeddings and FAISS indexes.
+Latency is measured from scheduled arrival, so it includes queueing.
+The embedding, retrieval and rerank-score caches are disabled unless
+``--use-caches`` is given, so warmup requests and ``--repeat`` replays
+measure the pipeline rather than cache hits and runs stay comparable with
+baselines saved before those caches existed.
+
+Examples:
+    python bench/loadtest.py --target retrieval --concurrency 4
+    python bench/loadtest.py --target agent --rate 2 --save-baseline bench/baseline_loadtest.json
+    python bench/loadtest.py --target agent --rate 2 --baseline bench/baseline_loadtest.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import resource
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import timing
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requests.jsonl")
+
+
+def load_requests(path: str, repeat: int = 1, limit: int = 0) -> list:
+    reqs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                req = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(req, dict) and req.get("query"):
+                reqs.append(req)
+    reqs = reqs * repeat
+    return reqs[:limit] if limit else reqs
+
+
+def make_stub_llm(tool_names: list, latency: float = 0.0):
+    """Offline ReAct stub: one tool call per question, then a final answer."""
+    from langchain_core.language_models.llms import LLM
+
+    class StubLLM(LLM):
+        latency: float = 0.0
+        tool_names: list = []
+
+        @property
+        def _llm_type(self) -> str:
+            return "nyaya-stub"
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            # The template also says "Question:"/"Observation:" in its
+            # instructions, so only look after the real question
+            turn = prompt.rsplit("Question:", 1)[-1]
+            if "Observation:" in turn:
+                return " I now know the final answer\nFinal Answer: Stub answer based on the retrieved passages."
+            question = turn.split("\n", 1)[0].strip()
+            tool = self.tool_names[sum(map(ord, question)) % len(self.tool_names)]
+            return f" I should search the statutes.\nAction: {tool}\nAction Input: {question}"
+
+    return StubLLM(latency=latency, tool_names=tool_names)
+
+
+def with_llm_timing(llm):
+    """Record every call of ``llm`` (stub or Gemini) as the ``llm`` stage."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMTimer(BaseCallbackHandler):
+        def __init__(self):
+            self.started = {}
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            t0 = self.started.pop(run_id, None)
+            if t0 is not None:
+                timing.record("llm", time.perf_counter() - t0)
+
+        on_llm_error = on_llm_end
+
+    llm.callbacks = list(llm.callbacks or []) + [LLMTimer()]
+    return llm
+
+
+class _NullCache(dict):
+    """Stands in for an LRU cache: lookups always miss, writes are dropped."""
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def disable_query_caches():
+    from tools import pdf_query_tools
+    from tools import reranker
+    pdf_query_tools._embed_cache = _NullCache()
+    pdf_query_tools._retrieval_cache = _NullCache()
+    reranker._scores = _NullCache()
+
+
+def make_target(name: str, stub_llm: bool, llm_latency: float):
+    from tools import pdf_query_tools
+
+    if name == "retrieval":
+        corpora = list(pdf_query_tools.CORPORA.values())
+
+        def run(query: str):
+            for corpus in corpora:
+                corpus.query(query)
+        return run
+
+    import agent as agent_module
+    if stub_llm:
+        tool_names = [t.name for t in pdf_query_tools.get_tools()]
+        build_llm = lambda: make_stub_llm(tool_names, llm_latency)
+    else:
+        build_llm = agent_module._build_llm
+    agent_module._build_llm = lambda: with_llm_timing(build_llm())
+    # Bypass the answer cache and query log so replays measure the pipeline
+    # and don't write stub answers into the production log
+    return agent_module._run_agent
+
+
+def _percentile(sorted_vals: list, pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    # Nearest-rank percentile
+    idx = min(len(sorted_vals) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+def run_load(reqs: list, target, concurrency: int, rate: float, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+
+    def one(req, arrival):
+        timing.start()
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            target(req["query"])
+        except Exception as e:
+            ok = False
+            print(f"Request failed: {e}")
+        end = time.perf_counter()
+        stages = timing.collect()
+        stages["queue"] = t0 - arrival
+        return {"latency": end - arrival, "ok": ok, "stages": stages}
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        next_arrival = start
+        for req in reqs:
+            if rate > 0:
+                next_arrival += rng.expovariate(rate)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                arrival = next_arrival
+            else:
+                arrival = time.perf_counter()
+            futures.append(pool.submit(one, req, arrival))
+        results = [f.result() for f in futures]
+        wall = time.perf_counter() - start
+
+    latencies = sorted(r["latency"] for r in results)
+    stage_totals = {}
+    for r in results:
+        for name, secs in r["stages"].items():
+            stage_totals[name] = stage_totals.get(name, 0.0) + secs
+    n = max(1, len(results))
+    return {
+        "requests": len(results),
+        "errors": sum(1 for r in results if not r["ok"]),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(results) / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / n, 1),
+            "p50": round(1000 * _percentile(latencies, 50), 1),
+            "p95": round(1000 * _percentile(latencies, 95), 1),
+            "p99": round(1000 * _percentile(latencies, 99), 1),
+        },
+        "stages_ms": {k: round(1000 * v / n, 1) for k, v in sorted(stage_totals.items())},
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Return human-readable regressions of ``report`` against ``baseline``."""
+    regressions = []
+    for key in ("p50", "p95", "p99"):
+        old, new = baseline["latency_ms"].get(key), report["latency_ms"].get(key)
+        if old and new > old * (1 + tolerance):
+            regressions.append(f"latency {key}: {old}ms -> {new}ms")
+    old, new = baseline.get("throughput_rps"), report.get("throughput_rps")
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"throughput: {old} -> {new} req/s")
+    old, new = baseline.get("peak_rss_mb"), report.get("peak_rss_mb")
+    if old and new > old * (1 + tolerance):
+        regressions.append(f"peak RSS: {old}MB -> {new}MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=DEFAULT_LOG, help="JSONL request log to replay")
+    parser.add_argument("--target", choices=["agent", "retrieval"], default="retrieval")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.0, help="mean arrivals per second (0 = closed loop)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests to load models first")
+    parser.add_argument("--real-llm", action="store_true", help="call Gemini instead of the offline stub")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--use-caches", action="store_true", help="keep the embed/retrieval/rerank caches on")
+    parser.add_argument("--baseline", help="compare against this saved report")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--save-baseline", help="write this run's report here")
+    args = parser.parse_args(argv)
+
+    reqs = load_requests(args.log, args.repeat, args.limit)
+    if not reqs:
+        print(f"No requests found in {args.log}")
+        return 1
+    target = make_target(args.target, not args.real_llm, args.llm_latency)
+    if not args.use_caches:
+        disable_query_caches()
+    for req in reqs[:args.warmup]:
+        target(req["query"])
+
+    report = run_load(reqs, target, args.concurrency, args.rate, args.seed)
+    report.update({
+        "target": args.target,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "stub_llm": not args.real_llm,
+        "caches": args.use_caches,
+    })
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("❌ Regressions vs baseline:")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print("✅ No regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
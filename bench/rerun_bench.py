@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Server-side time of a Streamlit rerun of ``app.py`` for a logged-in user.
+
+Runs the app headless with ``streamlit.testing.v1.AppTest`` and times
+repeated reruns of the chat page with ``--messages`` turns of history, i.e.
+what every click or message costs the server before anything reaches the
+browser. ``--rev`` runs ``app.py`` as of a git revision against the current
+tree, so a change can be measured before and after::
+
+    python bench/rerun_bench.py --rev HEAD~1
+    python bench/rerun_bench.py
+
+Reruns triggered inside the chat fragment are not visible to AppTest; set
+``NYAYA_RERUN_TIMING=1`` on a live app to log those per run.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_TIMEOUT_S = 60
+sys.path.insert(0, ROOT)
+
+
+def _app_path(rev: str) -> str:
+    if not rev:
+        return os.path.join(ROOT, "app.py")
+    source = subprocess.run(
+        ["git", "show", f"{rev}:app.py"], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    # Next to the real app so its imports resolve against this tree
+    path = os.path.join(ROOT, f".rerun_bench_app_{os.getpid()}.py")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+    return path
+
+
+def _seeded_chat(history_dir: str, username: str, messages: int):
+    from chat_store import ChatStore
+    chat = ChatStore(username, history_dir=history_dir)
+    for i in range(messages):
+        role = "human" if i % 2 == 0 else "ai"
+        chat.append(role, f"Message {i}: what does Article {i % 395 + 1} of the Constitution provide? " * 4)
+    return chat
+
+
+def _summary(times: list) -> dict:
+    ordered = sorted(times)
+    return {
+        "runs": len(times),
+        "mean_ms": round(1000 * sum(times) / len(times), 2),
+        "p50_ms": round(1000 * ordered[len(ordered) // 2], 2),
+        "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+    }
+
+
+def run(rev: str = None, reruns: int = 30, messages: int = 40, wait_ready: float = 300.0) -> dict:
+    from streamlit.testing.v1 import AppTest
+    import startup
+
+    app_path = _app_path(rev)
+    try:
+        with tempfile.TemporaryDirectory() as history_dir:
+            at = AppTest.from_file(app_path, default_timeout=RUN_TIMEOUT_S)
+            # As deployed: without any secrets, st.secrets renders an error element
+            at.secrets["JWT_SECRET"] = "rerun-bench"
+            at.session_state["auth_token"] = "rerun-bench"
+            at.session_state["username"] = "rerunbench"
+            at.session_state["chat"] = _seeded_chat(history_dir, "rerunbench", messages)
+
+            t0 = time.perf_counter()
+            at.run()
+            first = time.perf_counter() - t0
+            if at.exception:
+                raise RuntimeError(f"app raised: {at.exception}")
+
+            # Measure steady state, not reruns racing the background warmup
+            deadline = time.monotonic() + wait_ready
+            while not startup.is_ready() and time.monotonic() < deadline:
+                time.sleep(0.5)
+
+            times = []
+            for _ in range(reruns):
+                t0 = time.perf_counter()
+                at.run()
+                times.append(time.perf_counter() - t0)
+            if at.exception:
+                raise RuntimeError(f"app raised: {at.exception}")
+    finally:
+        if rev:
+            os.remove(app_path)
+
+    return {
+        "rev": rev or "working tree",
+        "messages": messages,
+        "first_run_ms": round(1000 * first, 2),
+        "rerun": _summary(times),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rev", help="git revision of app.py to measure (default: working tree)")
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--messages", type=int, default=40, help="chat history turns on the page")
+    parser.add_argument("--wait-ready", type=float, default=300.0, help="seconds to wait for warmup")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    print("⏱️  Measuring Streamlit reruns...")
+    report = run(args.rev, args.reruns, args.messages, args.wait_ready)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""Retrieval quality and speed benchmark over a golden query set.
+
+Each line of ``bench/golden_queries.jsonl`` names a corpus, a query, the
+Article/Section it should hit and an ``anchor`` regex for the start of that
+provision in the body text: the number plus heading and ".—" for Constitution
+Articles ("124. Establishment and constitution of the Supreme Court.—"), the
+number plus opening words for BNS Sections, whose headings are marginal
+notes. A retrieved chunk counts as relevant only when it contains the
+anchor, so chunks that merely mention the subject, and table-of-contents
+chunks listing the heading, do not score.
+
+The current indexes (``db/faiss_index_*``) are always measured. Candidate
+configurations are read from a JSON list of overrides, e.g.::
+
+    [{"label": "hnsw-600", "chunk_size": 600, "chunk_overlap": 150,
+      "index_type": "hnsw", "corpora": ["bns"]},
+     {"label": "minilm", "embedding_model": "sentence-transformers/all-MiniLM-L6-v2"}]
+
+and built into ``bench/.indexes`` so the live indexes are never touched.
+Reports recall@k, MRR, embed/search latency and index build/load time per
+configuration and corpus, and writes the full report as JSON. Candidates
+may also set ``extractor`` (``pypdf2``/``pymupdf``); extracted page text
+is cached, so only the first build per PDF and extractor pays for it.
+``retrieval`` (``flat``/``hierarchical``), ``top_units`` and
+``unit_levels`` only change how an index is searched, so candidates that
+differ in just those reuse the same index.
+
+    python bench/retrieval_bench.py --candidates bench/candidates.json --out bench_retrieval.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import pdf_query_tools
+from tools import hierarchy
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GOLDEN = os.path.join(BENCH_DIR, "golden_queries.jsonl")
+CANDIDATE_INDEX_DIR = os.path.join(BENCH_DIR, ".indexes")
+KS = (1, 3, 5, 10)
+# "14. Equality before law." lines of an arrangement-of-articles/sections page
+_TOC_LINE = re.compile(r"^\s*\[?\d+[A-Z]*\.\s*[A-Z][^—\n]*\.\s*$", re.MULTILINE)
+TOC_MIN_LINES = 3
+# Overrides that change search, not the index built
+SEARCH_KEYS = ("retrieval", "top_units", "unit_levels")
+
+
+def load_golden(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _is_toc(content: str) -> bool:
+    return len(_TOC_LINE.findall(content)) >= TOC_MIN_LINES
+
+
+def _first_hit(docs, anchor: str) -> int:
+    """1-based rank of the first chunk holding the provision's anchor, or 0."""
+    pattern = re.compile(anchor, re.IGNORECASE)
+    for rank, doc in enumerate(docs, start=1):
+        content = getattr(doc, "page_content", str(doc))
+        if not _is_toc(content) and pattern.search(content):
+            return rank
+    return 0
+
+
+def _ms(values: list) -> dict:
+    if not values:
+        return {"mean": 0.0, "p95": 0.0}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {"mean": round(1000 * sum(values) / len(values), 2), "p95": round(1000 * p95, 2)}
+
+
+def _searcher(db, tree=None, top_units: int = hierarchy.DEFAULT_TOP_UNITS):
+    if tree is None:
+        return lambda vector, k: db.similarity_search_by_vector(vector, k=k)
+
+    def search(vector, k):
+        return [db.docstore.search(db.index_to_docstore_id[i]) for i in tree.search(db.index, vector, k, top_units)]
+    return search
+
+
+def evaluate(db, embeddings, queries: list, search=None) -> dict:
+    """Score one vectorstore against the golden queries for its corpus."""
+    search = search or _searcher(db)
+    max_k = max(KS)
+    hits = {k: 0 for k in KS}
+    reciprocal_ranks = []
+    embed_times, search_times = [], []
+    for item in queries:
+        t0 = time.perf_counter()
+        vector = embeddings.embed_query(item["query"])
+        t1 = time.perf_counter()
+        docs = search(vector, max_k)
+        t2 = time.perf_counter()
+        embed_times.append(t1 - t0)
+        search_times.append(t2 - t1)
+
+        rank = _first_hit(docs, item["anchor"])
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        for k in KS:
+            if rank and rank <= k:
+                hits[k] += 1
+
+    n = max(1, len(queries))
+    return {
+        "queries": len(queries),
+        "recall": {f"@{k}": round(hits[k] / n, 3) for k in KS},
+        "mrr": round(sum(reciprocal_ranks) / n, 3),
+        "embed_ms": _ms(embed_times),
+        "search_ms": _ms(search_times),
+        "vectors": db.index.ntotal,
+    }
+
+
+def _embeddings_for(model_name: str):
+    if not model_name:
+        return pdf_query_tools._get_embeddings()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _candidate_dir(corpus, overrides: dict) -> str:
+    key = json.dumps({"corpus": corpus.name, **overrides}, sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CANDIDATE_INDEX_DIR, f"{corpus.name}-{digest}")
+
+
+def run_config(label: str, overrides: dict, golden: list, rebuild: bool = False) -> dict:
+    overrides = {k: v for k, v in overrides.items() if k not in ("label", "corpora")}
+    embeddings = _embeddings_for(overrides.get("embedding_model"))
+    results = {}
+    for corpus in pdf_query_tools.CORPORA.values():
+        queries = [q for q in golden if q["corpus"] == corpus.name]
+        if not queries:
+            continue
+        index_overrides = {k: v for k, v in overrides.items() if k not in SEARCH_KEYS}
+        if index_overrides:
+            index_dir = _candidate_dir(corpus, index_overrides)
+        else:
+            index_dir = corpus.index_dir
+        if rebuild and os.path.isdir(index_dir) and index_dir.startswith(CANDIDATE_INDEX_DIR):
+            shutil.rmtree(index_dir)
+        index_path = os.path.join(index_dir, "index.faiss")
+        before = os.path.getmtime(index_path) if os.path.exists(index_path) else None
+
+        t0 = time.perf_counter()
+        db = pdf_query_tools._load_or_build_faiss(
+            index_dir,
+            corpus.pdf_path,
+            int(overrides.get("chunk_size", corpus.chunk_size)),
+            int(overrides.get("chunk_overlap", corpus.chunk_overlap)),
+            overrides.get("index_type", corpus.index_type),
+            embeddings_model=embeddings,
+            cleanup=bool(overrides.get("cleanup", corpus.cleanup)),
+            extractor=overrides.get("extractor", corpus.extractor),
+            unit_levels=overrides.get("unit_levels", corpus.unit_levels),
+        )
+        load_s = time.perf_counter() - t0
+
+        tree = None
+        retrieval = overrides.get("retrieval", corpus.retrieval)
+        if retrieval == "hierarchical":
+            tree = hierarchy.load_or_build(index_dir, db, overrides.get("unit_levels", corpus.unit_levels))
+        search = _searcher(db, tree, int(overrides.get("top_units", corpus.top_units)))
+
+        metrics = evaluate(db, embeddings, queries, search)
+        # Missing or stale (settings changed) indexes are rebuilt
+        built = not os.path.exists(index_path) or os.path.getmtime(index_path) != before
+        metrics["build_s" if built else "load_s"] = round(load_s, 2)
+        metrics["retrieval"] = retrieval
+        if tree is not None:
+            metrics["units"] = len(tree.labels)
+        metrics["index_dir"] = index_dir
+        results[corpus.name] = metrics
+        print(f"  ├─ {label}/{corpus.name}: recall@3={metrics['recall']['@3']} mrr={metrics['mrr']}")
+    return {"label": label, "overrides": overrides, "corpora": results}
+
+
+def _print_table(report: list):
+    header = f"{'config':<18}{'corpus':<14}{'R@1':>6}{'R@3':>6}{'R@5':>6}{'R@10':>6}{'MRR':>7}{'embed ms':>10}{'search ms':>11}{'build/load s':>14}"
+    print(header)
+    print("-" * len(header))
+    for cfg in report:
+        for name, m in cfg["corpora"].items():
+            r = m["recall"]
+            secs = m.get("build_s", m.get("load_s", 0.0))
+            print(
+                f"{cfg['label']:<18}{name:<14}{r['@1']:>6}{r['@3']:>6}{r['@5']:>6}{r['@10']:>6}{m['mrr']:>7}"
+                f"{m['embed_ms']['mean']:>10}{m['search_ms']['mean']:>11}{secs:>14}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--candidates", help="JSON list of candidate configurations")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild cached candidate indexes")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    golden = load_golden(args.golden)
+    configs = [("current", {})]
+    if args.candidates:
+        with open(args.candidates, "r") as f:
+            for i, cand in enumerate(json.load(f)):
+                configs.append((cand.get("label", f"candidate-{i + 1}"), cand))
+
+    report = []
+    print("📏 Running retrieval benchmark...")
+    for label, overrides in configs:
+        only = overrides.get("corpora")
+        subset = [q for q in golden if not only or q["corpus"] in only]
+        report.append(run_config(label, overrides, subset, args.rebuild))
+
+    _print_table(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare thread-budget profiles under the same replayed load.
+
+Thread pools are fixed once torch and faiss are imported, so every profile
+runs ``bench/loadtest.py`` in its own process with ``NYAYA_THREAD_PROFILE``
+set. Every profile is driven at the same ``--concurrency``/``--rate``; the
+profile's ``cpu_slot()`` semaphore does the limiting. An ``unmanaged`` run
+(every op may use all cores and no op waits for a slot, the behaviour
+before the budget existed) is included as the reference.
+
+    python bench/thread_bench.py --target retrieval
+    python bench/thread_bench.py --target agent --llm-latency 0.5 --concurrency 16 --out bench_threads.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import thread_budget
+
+LOADTEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loadtest.py")
+_BUDGET_VARS = (
+    "NYAYA_THREAD_PROFILE", "NYAYA_TORCH_THREADS", "NYAYA_TORCH_INTEROP_THREADS",
+    "NYAYA_FAISS_THREADS", "NYAYA_REQUEST_CONCURRENCY",
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+)
+
+
+def _profile_env(profile: str, cpus: int, concurrency: int) -> tuple:
+    env = {k: v for k, v in os.environ.items() if k not in _BUDGET_VARS}
+    env["NYAYA_CPUS"] = str(cpus)
+    if profile == "unmanaged":
+        # As many CPU slots as load workers, so no op ever waits for one
+        budget = {"request_concurrency": concurrency, "torch_threads": cpus, "faiss_threads": cpus}
+        env.update({
+            "NYAYA_REQUEST_CONCURRENCY": str(concurrency),
+            "NYAYA_TORCH_THREADS": str(cpus),
+            "NYAYA_FAISS_THREADS": str(cpus),
+            "NYAYA_TORCH_INTEROP_THREADS": str(cpus),
+        })
+    else:
+        budget = thread_budget.resolve(profile, cpus)
+        env["NYAYA_THREAD_PROFILE"] = profile
+    return env, budget
+
+
+def run_profile(profile: str, cpus: int, concurrency: int, rate: float, loadtest_args: list) -> dict:
+    env, budget = _profile_env(profile, cpus, concurrency)
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        out_path = tmp.name
+    try:
+        cmd = [sys.executable, LOADTEST, "--concurrency", str(concurrency), "--rate", str(rate),
+               "--save-baseline", out_path] + loadtest_args
+        print(f"⏱️  {profile}: {' '.join(cmd[1:])}")
+        subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(out_path, "r") as f:
+            report = json.load(f)
+    finally:
+        os.remove(out_path)
+    report["profile"] = profile
+    report["budget"] = budget
+    return report
+
+
+def _print_table(reports: list):
+    header = f"{'profile':<12}{'slots':>6}{'torch':>7}{'faiss':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>8}{'rss MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in reports:
+        b, lat = r["budget"], r["latency_ms"]
+        print(
+            f"{r['profile']:<12}{b['request_concurrency']:>6}{b['torch_threads']:>7}{b['faiss_threads']:>7}"
+            f"{lat['p50']:>10}{lat['p95']:>10}{lat['p99']:>10}{r['throughput_rps']:>8}{r['peak_rss_mb']:>9}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", default="unmanaged," + ",".join(thread_budget.PROFILES))
+    parser.add_argument("--cpus", type=int, default=0, help="cores to budget for (default: available)")
+    parser.add_argument("--concurrency", type=int, default=0,
+                        help="load workers for every profile (default: 2x cores, above every profile's slots)")
+    parser.add_argument("--rate", type=float, default=0.0, help="mean arrivals per second (0 = closed loop)")
+    parser.add_argument("--out", help="write the JSON report here")
+    args, loadtest_args = parser.parse_known_args(argv)
+
+    cpus = args.cpus or thread_budget.available_cpus()
+    concurrency = args.concurrency or 2 * cpus
+    reports = [
+        run_profile(p.strip(), cpus, concurrency, args.rate, loadtest_args)
+        for p in args.profiles.split(",") if p.strip()
+    ]
+
+    load = f"rate {args.rate}/s" if args.rate else "closed loop"
+    print(f"\n🧵 Thread profiles on {cpus} CPUs, {concurrency} workers, {load}")
+    _print_table(reports)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Saved report to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
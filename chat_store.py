@@ -0,0 +1,188 @@
+"""Bounded, persisted chat history for the Streamlit UI.
+
+Every user gets an append-only JSONL file under ``db/chat_history``. Only a
+window of recent messages is kept in ``st.session_state``; older turns stay
+on disk and are paged back in when the user asks for them.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+
+HISTORY_DIR = os.path.join("db", "chat_history")
+WINDOW_MESSAGES = int(os.environ.get("NYAYA_CHAT_WINDOW", "40"))
+MAX_SESSION_CHARS = int(os.environ.get("NYAYA_CHAT_MAX_CHARS", "200000"))
+PAGE_SIZE = 20
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    """One lock per history file so two tabs of the same user don't interleave writes."""
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = threading.Lock()
+        return lock
+
+
+def _user_file(username: str, history_dir: str = HISTORY_DIR) -> str:
+    # Registration only allows alphanumeric names, but older accounts may not be
+    safe = username if username.isalnum() else hashlib.sha256(username.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(history_dir, f"{safe}.jsonl")
+
+
+def _tail_lines(path: str, skip: int, limit: int, block_size: int = 8192):
+    """Read up to ``limit`` lines that precede the last ``skip`` lines of a file.
+
+    The file is scanned backwards in blocks so paging stays cheap on long
+    histories. Returns ``(lines, has_more)`` with lines oldest first.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return [], False
+
+    needed = skip + limit
+    lines = []
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b""
+        while pos > 0 and len(lines) < needed:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            parts = (f.read(step) + tail).split(b"\n")
+            tail = parts[0]
+            lines = [p for p in parts[1:] if p.strip()] + lines
+        if pos == 0 and tail.strip():
+            lines = [tail] + lines
+            tail = b""
+
+    end = max(0, len(lines) - skip)
+    start = max(0, end - limit)
+    has_more = start > 0 or pos > 0 or bool(tail.strip())
+    return lines[start:end], has_more
+
+
+def _decode(raw: bytes):
+    try:
+        msg = json.loads(raw.decode("utf-8"))
+    except Exception:
+        return None
+    if not isinstance(msg, dict) or "type" not in msg or "content" not in msg:
+        return None
+    return msg
+
+
+class ChatStore:
+    """Recent-message window over a user's on-disk chat history.
+
+    ``messages()`` returns what the UI should draw: any pages loaded with
+    ``load_older()`` followed by the recent window. The total size held in
+    memory is capped by ``window`` messages and ``max_chars`` characters;
+    evicted messages remain on disk and can be paged back in.
+    """
+
+    def __init__(self, username: str, window: int = WINDOW_MESSAGES,
+                 max_chars: int = MAX_SESSION_CHARS, history_dir: str = HISTORY_DIR):
+        self.username = username
+        self.path = _user_file(username, history_dir)
+        self.window = window
+        self.max_chars = max_chars
+        self.recent = deque()
+        self.older = deque()
+        self.has_more = False
+        self._chars = 0
+        # Size of the newest message on disk that precedes what is in memory,
+        # once known; lets ``at_cap`` tell whether paging could add anything
+        self._next_older_chars = None
+        # Number of lines, counted from the end of the file, that are in memory
+        self._disk_seen = 0
+        self._load_recent()
+
+    def _load_recent(self):
+        raw, self.has_more = _tail_lines(self.path, 0, self.window)
+        for line in raw:
+            msg = _decode(line)
+            if msg is not None:
+                self.recent.append(msg)
+                self._chars += len(msg["content"])
+        self._disk_seen = len(raw)
+        self._enforce_cap()
+
+    def _drop(self, msg: dict):
+        self._chars -= len(msg["content"])
+        self._disk_seen -= 1
+        self.has_more = True
+        self._next_older_chars = len(msg["content"])
+
+    def _enforce_cap(self):
+        # The window bounds ``recent`` only; once older pages are loaded the
+        # overflow joins them, so paged-in history stays contiguous on screen
+        while len(self.recent) > self.window:
+            msg = self.recent.popleft()
+            if self.older:
+                self.older.append(msg)
+            else:
+                self._drop(msg)
+        # Only the character cap evicts paged-in messages, oldest first
+        while self._chars > self.max_chars and len(self) > 1:
+            side = self.older if self.older else self.recent
+            self._drop(side.popleft())
+
+    def append(self, role: str, content: str) -> dict:
+        """Persist a message and add it to the in-memory window."""
+        msg = {"type": role, "content": content, "ts": time.time()}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            line = json.dumps(msg, ensure_ascii=False) + "\n"
+            with _lock_for(self.path):
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            self._disk_seen += 1
+        except OSError as e:
+            print(f"Chat history write failed for {self.username}: {e}")
+        self.recent.append(msg)
+        self._chars += len(content)
+        self._enforce_cap()
+        return msg
+
+    def load_older(self, count: int = PAGE_SIZE) -> int:
+        """Page older messages in from disk. Returns how many were added."""
+        raw, has_more = _tail_lines(self.path, self._disk_seen, count)
+        added = 0
+        # Walk newest-first so the memory cap drops the oldest of the page
+        for line in reversed(raw):
+            msg = _decode(line)
+            self._disk_seen += 1
+            if msg is None:
+                continue
+            if self._chars + len(msg["content"]) > self.max_chars:
+                self._disk_seen -= 1
+                has_more = True
+                self._next_older_chars = len(msg["content"])
+                break
+            self.older.appendleft(msg)
+            self._chars += len(msg["content"])
+            self._next_older_chars = None
+            added += 1
+        self.has_more = has_more
+        return added
+
+    @property
+    def at_cap(self) -> bool:
+        """True when older messages exist but the next one would exceed ``max_chars``."""
+        return (self.has_more and self._next_older_chars is not None
+                and self._chars + self._next_older_chars > self.max_chars)
+
+    def messages(self) -> list:
+        return list(self.older) + list(self.recent)
+
+    def __len__(self):
+        return len(self.older) + len(self.recent)
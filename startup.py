@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Startup orchestration: in-process warmup, readiness probe and lazy agent access.
+
+Run ``python startup.py`` (the container entrypoint) to start Streamlit in
+this process after kicking off a background warmup, so the embeddings,
+FAISS indexes and agent executor are loaded into the same process that
+serves users. ``app.py`` never imports ``agent`` on the login screen; it
+calls ``get_agent()`` on the first authenticated query instead.
+
+Liveness stays on Streamlit's ``/_stcore/health``. Readiness is served
+separately on ``NYAYA_READY_PORT`` (``/readyz``) and only returns 200 once
+warmup has finished. A failed warmup (e.g. a transient model download
+error) is retried with exponential backoff, so the process does not stay
+unready forever; the same port serves admission queue metrics on
+``/queuez``. ``python startup.py --check`` queries it for exec-style
+probes.
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+READY_PORT = int(os.environ.get("NYAYA_READY_PORT", "8503"))
+READY_FILE = os.environ.get("NYAYA_READY_FILE", "/tmp/nyaya_ready.json")
+WARM_RETRY_INITIAL_S = float(os.environ.get("NYAYA_WARM_RETRY_INITIAL_S", "5"))
+WARM_RETRY_MAX_S = float(os.environ.get("NYAYA_WARM_RETRY_MAX_S", "300"))
+
+_process_start = time.monotonic()
+_state_lock = threading.Lock()
+_state = {
+    "ready": False,
+    "warming": False,
+    "error": None,
+    "stages": {},
+    "cold_start_s": None,
+    "attempts": 0,
+}
+_warm_thread = None
+
+
+@contextmanager
+def _stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _state_lock:
+            _state["stages"][name] = round(elapsed, 3)
+        print(f"  ├─ {name}: {elapsed:.2f}s")
+
+
+def warm(include_agent: bool = True):
+    """Load embeddings, FAISS indexes and (optionally) the agent executor.
+
+    Used both at image build time (``include_agent=False``, no API key
+    needed) and in the serving process. Stage timings and the total cold
+    start are recorded in the readiness state and written to ``READY_FILE``.
+    """
+    with _state_lock:
+        _state["warming"] = True
+        _state["attempts"] += 1
+        _state["error"] = None
+    print("🔥 Starting warmup...")
+    try:
+        with _stage("import_tools"):
+            from tools import pdf_query_tools
+        with _stage("embeddings"):
+            pdf_query_tools._get_embeddings()
+        if pdf_query_tools.reranker.ENABLED:
+            with _stage("reranker"):
+                pdf_query_tools.reranker._get_model()
+        for corpus in pdf_query_tools.CORPORA.values():
+            if not corpus.preload:
+                continue
+            with _stage(f"{corpus.name}_index"):
+                corpus.query("preamble")
+    except Exception as e:
+        with _state_lock:
+            _state["error"] = str(e)
+            _state["warming"] = False
+        print(f"⚠️  Warmup warning: {e}")
+        print("System will warm up on first query instead.")
+        return False
+
+    if include_agent:
+        # Retrieval is what dominates cold start; if the LLM client cannot be
+        # created yet (e.g. API key only arrives via app secrets) it is built
+        # on the first query instead of holding readiness back.
+        try:
+            with _stage("agent"):
+                from agent import _get_agent_executor
+                _get_agent_executor()
+        except Exception as e:
+            with _state_lock:
+                _state["error"] = f"agent: {e}"
+            print(f"⚠️  Agent init deferred: {e}")
+
+        # Replay popular recent questions so they are fast right after a deploy
+        try:
+            with _stage("log_warm"):
+                from tools import query_log
+                warmed = query_log.warm_caches()
+            print(f"  ├─ Warmed caches for {warmed} popular queries")
+        except Exception as e:
+            print(f"⚠️  Log-driven warmup skipped: {e}")
+
+    with _state_lock:
+        _state["ready"] = True
+        _state["warming"] = False
+        _state["cold_start_s"] = round(time.monotonic() - _process_start, 3)
+        report = dict(_state)
+    print(f"✅ Warmup complete in {report['cold_start_s']:.2f}s since process start. System ready for queries.")
+    try:
+        with open(READY_FILE, "w") as f:
+            json.dump(report, f, indent=2)
+    except OSError:
+        pass
+    return True
+
+
+def _warm_until_ready():
+    delay = WARM_RETRY_INITIAL_S
+    while not warm():
+        print(f"🔁 Retrying warmup in {delay:.0f}s")
+        time.sleep(delay)
+        delay = min(delay * 2, WARM_RETRY_MAX_S)
+
+
+def start_background_warmup():
+    """Start the in-process warmup (retried until it succeeds) once; later calls are no-ops."""
+    global _warm_thread
+    with _state_lock:
+        if _warm_thread is not None:
+            return
+        _warm_thread = threading.Thread(target=_warm_until_ready, name="nyaya-warmup", daemon=True)
+    _warm_thread.start()
+
+
+def is_ready() -> bool:
+    with _state_lock:
+        return _state["ready"]
+
+
+def status() -> dict:
+    with _state_lock:
+        return {**_state, "stages": dict(_state["stages"])}
+
+
+def get_agent():
+    """Import the agent module on first use and return its ``agent`` callable."""
+    from agent import agent
+    return agent
+
+
+def cached_answer(query: str):
+    """Cached answer for ``query`` or None; checked before admission so hits skip the queue."""
+    from agent import cached_answer
+    return cached_answer(query)
+
+
+class _ReadinessHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/queuez":
+            import admission
+            body, code = admission.get_controller().metrics(), 200
+        elif path in ("/readyz", "/startupz"):
+            body = status()
+            code = 200 if body["ready"] or path == "/startupz" else 503
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # Probes hit this every few seconds; keep them out of the app log
+        pass
+
+
+def serve_readiness(port: int = READY_PORT):
+    server = ThreadingHTTPServer(("0.0.0.0", port), _ReadinessHandler)
+    threading.Thread(target=server.serve_forever, name="nyaya-readyz", daemon=True).start()
+    return server
+
+
+def check(port: int = READY_PORT) -> int:
+    """Exit code for exec-style readiness probes: 0 when ready, 1 otherwise."""
+    import urllib.request
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=3) as resp:
+            return 0 if resp.status == 200 else 1
+    except Exception:
+        return 1
+
+
+def main():
+    # Streamlit's "import startup" in app.py must see this module's state,
+    # not a second copy of it
+    sys.modules.setdefault("startup", sys.modules[__name__])
+
+    if "--check" in sys.argv[1:]:
+        sys.exit(check())
+
+    try:
+        os.remove(READY_FILE)
+    except OSError:
+        pass
+    serve_readiness()
+    start_background_warmup()
+
+    # Run Streamlit in this process so app.py shares the warmed modules
+    from streamlit.web import cli as stcli
+    port = os.environ.get("PORT", "8501")
+    sys.argv = [
+        "streamlit", "run", "app.py",
+        f"--server.port={port}",
+        "--server.address=0.0.0.0",
+    ]
+    sys.exit(stcli.main())
+
+
+if __name__ == "__main__":
+    main()
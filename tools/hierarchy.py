@@ -0,0 +1,197 @@
+"""Two-level (coarse-to-fine) retrieval over structural units of a statute.
+
+Flat search scores every chunk of a corpus. Here chunks are grouped into
+the statute's own structure (Parts and Chapters of the Constitution,
+Chapters of the BNS): a query is first scored against one vector per unit,
+then only the chunks of the best ``top_units`` units are searched. That
+keeps search cost proportional to a few units as statutes are added, and
+stops stray chunks from unrelated Parts crowding the top-k.
+
+Units are found by heading lines in the chunk text (``PART V``,
+``CHAPTER IV``; PyPDF2 often glues a page number or footnote marker in
+front, e.g. ``26PART V``). A chunk belongs to the unit in effect at its
+midpoint. Each unit's vector is the normalised centroid of its chunk
+embeddings, read back from the FAISS index once at build time, so no extra
+model calls are needed. Chunk search then runs on the FAISS index itself,
+restricted to the chosen units with an ``IDSelectorBatch``, so no second
+copy of the vectors is held and HNSW/IVF indexes keep their speed-up. The
+grouping and centroids are stored next to the index as ``units.json`` /
+``units.npy``, keyed on the index file's hash, and rebuilt when it changes.
+"""
+
+import os
+import re
+import json
+import hashlib
+
+DEFAULT_LEVELS = ("PART", "CHAPTER")
+DEFAULT_TOP_UNITS = 3
+_FORMAT_VERSION = 2
+
+
+def _heading_pattern(levels) -> re.Pattern:
+    keywords = "|".join(re.escape(level.upper()) for level in levels)
+    return re.compile(
+        rf"^[\d\[\s]*({keywords})\s+([IVXLC]+[A-Z]?)(?![a-z])(.*)$",
+        re.MULTILINE,
+    )
+
+
+def assign_units(texts: list, levels=DEFAULT_LEVELS) -> tuple:
+    """Group chunks (in document order) by the structural unit they fall in.
+
+    Returns ``(labels, titles, chunk_units)`` where ``chunk_units[i]`` is the
+    index into ``labels`` of chunk ``i``. Repeated headings (table of
+    contents, chunk overlap) map to the same unit.
+    """
+    levels = [level.upper() for level in levels]
+    pattern = _heading_pattern(levels)
+    state = {}
+    labels, titles, index = [], [], {}
+
+    def current_unit():
+        label = " / ".join(f"{lvl} {state[lvl]}" for lvl in levels if lvl in state) or "PREAMBLE"
+        if label not in index:
+            index[label] = len(labels)
+            labels.append(label)
+            titles.append("")
+        return index[label]
+
+    def apply(match):
+        level, number = match.group(1), match.group(2)
+        state[level] = number
+        # A new Part starts its Chapters over
+        for deeper in levels[levels.index(level) + 1:]:
+            state.pop(deeper, None)
+        unit = current_unit()
+        title = match.group(3).strip(" .—-\t")
+        if title and not titles[unit]:
+            titles[unit] = title[:120]
+
+    chunk_units = []
+    for text in texts:
+        midpoint = len(text) // 2
+        matches = list(pattern.finditer(text))
+        for m in matches:
+            if m.start() <= midpoint:
+                apply(m)
+        chunk_units.append(current_unit())
+        for m in matches:
+            if m.start() > midpoint:
+                apply(m)
+    return labels, titles, chunk_units
+
+
+class Hierarchy:
+    """Unit centroids plus the chunk positions (FAISS ids) in each unit."""
+
+    def __init__(self, labels: list, titles: list, members: list, centroids):
+        self.labels = labels
+        self.titles = titles
+        self.members = members
+        self.centroids = centroids
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.centroids.nbytes)
+
+    def search(self, index, vector, fetch_k: int, top_units: int = DEFAULT_TOP_UNITS) -> list:
+        """FAISS positions of the ``fetch_k`` nearest chunks of ``index`` within the best units."""
+        import numpy as np
+        import faiss
+        q = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(q)
+        ranked = np.argsort(-(self.centroids @ (q / norm if norm else q)))
+
+        # Widen past top_units when the chosen units hold fewer than fetch_k chunks
+        positions = []
+        for n, unit in enumerate(ranked):
+            if n >= top_units and len(positions) >= fetch_k:
+                break
+            positions.extend(self.members[unit])
+
+        selector = faiss.IDSelectorBatch(np.asarray(positions, dtype="int64"))
+        _, rows = index.search(q.reshape(1, -1), fetch_k, params=_search_params(index, selector))
+        return [int(p) for p in rows[0] if p != -1]
+
+
+def _search_params(index, selector):
+    import faiss
+    # Each index family only accepts its own parameter class
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def _index_digest(index_dir: str) -> str:
+    h = hashlib.sha256()
+    with open(os.path.join(index_dir, "index.faiss"), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _reconstruct_all(index):
+    if hasattr(index, "make_direct_map"):
+        # IVF indexes need a direct map before vectors can be read back
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def build(db, levels=DEFAULT_LEVELS) -> Hierarchy:
+    import numpy as np
+    n = db.index.ntotal
+    texts = [getattr(db.docstore.search(db.index_to_docstore_id[i]), "page_content", "") for i in range(n)]
+    labels, titles, chunk_units = assign_units(texts, levels)
+
+    vectors = np.asarray(_reconstruct_all(db.index), dtype="float32")
+    members = [[] for _ in labels]
+    for pos, unit in enumerate(chunk_units):
+        members[unit].append(pos)
+    # Units can end up empty when their heading only appears past a chunk midpoint
+    keep = [u for u, m in enumerate(members) if m]
+    labels = [labels[u] for u in keep]
+    titles = [titles[u] for u in keep]
+    members = [members[u] for u in keep]
+
+    centroids = np.stack([vectors[m].mean(axis=0) for m in members]).astype("float32")
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids /= np.where(norms > 0, norms, 1.0)
+    return Hierarchy(labels, titles, members, centroids)
+
+
+def load_or_build(index_dir: str, db, levels=DEFAULT_LEVELS) -> Hierarchy:
+    """Load the unit sidecar for ``db`` from ``index_dir``, rebuilding it if stale.
+
+    ``db`` must be the index saved in ``index_dir``; the sidecar is keyed on
+    that file's hash.
+    """
+    import numpy as np
+    levels = [level.upper() for level in levels]
+    meta_path = os.path.join(index_dir, "units.json")
+    centroids_path = os.path.join(index_dir, "units.npy")
+    digest = _index_digest(index_dir)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if (meta.get("version") == _FORMAT_VERSION and meta.get("index_sha256") == digest
+                and meta.get("levels") == levels):
+            return Hierarchy(meta["labels"], meta["titles"], meta["members"], np.load(centroids_path))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    hierarchy = build(db, levels)
+    print(f"Built {len(hierarchy.labels)} retrieval units for {index_dir}")
+    np.save(centroids_path, hierarchy.centroids)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": _FORMAT_VERSION,
+            "index_sha256": digest,
+            "levels": levels,
+            "labels": hierarchy.labels,
+            "titles": hierarchy.titles,
+            "members": hierarchy.members,
+        }, f)
+    return hierarchy
@@ -0,0 +1,211 @@
+"""Index-time cleanup of extracted PDF text before chunks are embedded.
+
+PyPDF2 output for the gazette PDFs repeats running headers/footers, page
+numbers and gazette boilerplate on every page, and carries amendment
+footnote markers inside the text. Those end up as (near-)identical chunks
+that crowd real provisions out of the top-k. Two passes run before
+embedding:
+
+* ``strip_boilerplate`` drops header/footer lines that recur on a large
+  share of pages (after masking digits, so "Page 12" and "Page 13" match),
+  running headers that repeat over consecutive pages or look like one
+  ("(Part V.—The Union)30" on every page of Part V), known gazette lines
+  and footnote markers;
+* ``dedupe_chunks`` drops chunks whose 64-bit SimHash is within a small
+  Hamming distance of a chunk already kept.
+
+Run ``python -m tools.ingest_cleanup`` to see how many vectors and bytes
+the cleanup removes from each ``db/faiss_index_*``; add ``--rebuild`` to
+rebuild the indexes with it.
+"""
+
+import re
+import hashlib
+from collections import Counter
+
+# A header/footer line on at least this share of pages (and at least
+# MIN_PAGES pages) is boilerplate
+REPEAT_FRACTION = 0.3
+MIN_PAGES = 3
+# Only the first/last few lines of a page are header/footer candidates, so
+# recurring body lines such as "Illustrations" are kept
+EDGE_LINES = 3
+# A top line seen on RUN_PAGES pages within RUN_WINDOW consecutive pages is a
+# running header even if it never reaches REPEAT_FRACTION of the document
+RUN_PAGES = 3
+RUN_WINDOW = 5
+SIMHASH_DISTANCE = 3
+
+_GAZETTE_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in (
+        r"^the gazette of india",
+        r"^extraordinary$",
+        r"^registered no\.",
+        r"^published by authority",
+        r"^\[?part ii\s*[—-]",
+        r"^ministry of law and justice",
+        r"^\(legislative department\)",
+        r"^new delhi,? the",
+        r"^\d+\s*$",  # bare page numbers
+    )
+]
+# Running headers of the Constitution: "(Part V.—The Union)30",
+# "(Seventh Schedule) 270", "(Appendix I) 12"
+_RUNNING_HEADER = re.compile(
+    r"^\((part\s*[ivxlc]+[a-z]?|[a-z]+\s+schedule|appendix\s*[ivxlc]+)\b[^)]*\)\s*\d*$",
+    re.IGNORECASE,
+)
+# Footnote numbers in front of amendment brackets ("1[", "2***"); the
+# brackets themselves stay, since they delimit the amended text
+_FOOTNOTE_MARKERS = re.compile(r"(?<![\w\]])\d{1,2}(?=\[)|\*{2,}")
+
+
+def _line_key(line: str) -> str:
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def strip_boilerplate(pages: list, repeat_fraction: float = REPEAT_FRACTION) -> tuple:
+    """Remove repeated per-page lines, gazette lines and footnote markers.
+
+    Returns ``(cleaned_pages, stats)``.
+    """
+    page_lines = [(p or "").splitlines() for p in pages]
+
+    def non_empty(lines):
+        return [i for i, l in enumerate(lines) if l.strip()]
+
+    def edges(lines):
+        idx = non_empty(lines)
+        return set(idx[:EDGE_LINES] + idx[-EDGE_LINES:])
+
+    counts = Counter()
+    top_pages = {}
+    for page_no, lines in enumerate(page_lines):
+        counts.update({_line_key(lines[i]) for i in edges(lines)})
+        for key in {_line_key(lines[i]) for i in non_empty(lines)[:EDGE_LINES]}:
+            top_pages.setdefault(key, []).append(page_no)
+    threshold = max(MIN_PAGES, int(repeat_fraction * len(pages)))
+    repeated = {key for key, n in counts.items() if n >= threshold}
+    # Per-Part headers only repeat within their Part: look for runs instead
+    for key, seen in top_pages.items():
+        if any(seen[j + RUN_PAGES - 1] - seen[j] < RUN_WINDOW for j in range(len(seen) - RUN_PAGES + 1)):
+            repeated.add(key)
+
+    cleaned, removed_lines, removed_bytes = [], 0, 0
+    for lines in page_lines:
+        edge_idx = edges(lines)
+        kept = []
+        for i, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped and (
+                (i in edge_idx and (_line_key(stripped) in repeated or _RUNNING_HEADER.match(stripped)))
+                or any(p.search(stripped) for p in _GAZETTE_PATTERNS)
+            ):
+                removed_lines += 1
+                removed_bytes += len(line.encode("utf-8"))
+                continue
+            new_line = _FOOTNOTE_MARKERS.sub("", line)
+            removed_bytes += len(line.encode("utf-8")) - len(new_line.encode("utf-8"))
+            kept.append(new_line)
+        cleaned.append("\n".join(kept))
+
+    return cleaned, {
+        "pages": len(pages),
+        "repeated_line_patterns": len(repeated),
+        "boilerplate_lines_removed": removed_lines,
+        "boilerplate_bytes_removed": removed_bytes,
+    }
+
+
+def simhash(text: str, ngram: int = 3) -> int:
+    """64-bit SimHash over word n-gram shingles."""
+    words = re.findall(r"\w+", text.lower())
+    shingles = [" ".join(words[i:i + ngram]) for i in range(max(1, len(words) - ngram + 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def dedupe_chunks(texts: list, max_distance: int = SIMHASH_DISTANCE) -> tuple:
+    """Drop chunks that are near-duplicates of an earlier chunk.
+
+    Candidates are found by splitting the hash into ``max_distance + 1``
+    bands (pigeonhole: any pair within the distance shares a band), so this
+    stays close to linear in the number of chunks. Returns
+    ``(kept_texts, stats)``.
+    """
+    bands = max_distance + 1
+    width = 64 // bands
+    mask = (1 << width) - 1
+    buckets = [{} for _ in range(bands)]
+    kept, kept_hashes = [], []
+    removed, removed_bytes = 0, 0
+    for text in texts:
+        h = simhash(text)
+        keys = [(h >> (b * width)) & mask for b in range(bands)]
+        duplicate = False
+        for b, key in enumerate(keys):
+            for idx in buckets[b].get(key, ()):
+                if bin(h ^ kept_hashes[idx]).count("1") <= max_distance:
+                    duplicate = True
+                    break
+            if duplicate:
+                break
+        if duplicate:
+            removed += 1
+            removed_bytes += len(text.encode("utf-8"))
+            continue
+        idx = len(kept)
+        kept.append(text)
+        kept_hashes.append(h)
+        for b, key in enumerate(keys):
+            buckets[b].setdefault(key, []).append(idx)
+
+    return kept, {
+        "chunks_before": len(texts),
+        "chunks_after": len(kept),
+        "near_duplicates_removed": removed,
+        "duplicate_bytes_removed": removed_bytes,
+    }
+
+
+def _report(rebuild: bool = False):
+    import os
+    import json
+    import shutil
+    from tools import pdf_query_tools
+
+    for corpus in pdf_query_tools.CORPORA.values():
+        pages = pdf_query_tools._extract_pages(corpus.pdf_path, corpus.extractor)
+        raw_chunks, _ = pdf_query_tools._chunk_pages(pages, corpus.chunk_size, corpus.chunk_overlap, cleanup=False)
+        clean_chunks, stats = pdf_query_tools._chunk_pages(pages, corpus.chunk_size, corpus.chunk_overlap, cleanup=True)
+
+        dim = 768  # all-mpnet-base-v2
+        vectors_removed = len(raw_chunks) - len(clean_chunks)
+        text_bytes_removed = sum(len(t.encode("utf-8")) for t in raw_chunks) - sum(len(t.encode("utf-8")) for t in clean_chunks)
+        report = {
+            **stats,
+            "vectors_before": len(raw_chunks),
+            "vectors_after": len(clean_chunks),
+            "vectors_removed": vectors_removed,
+            "vector_bytes_removed": vectors_removed * dim * 4,
+            "text_bytes_removed": text_bytes_removed,
+        }
+        print(f"📄 {corpus.name} ({corpus.index_dir})")
+        print(json.dumps(report, indent=2))
+
+        if rebuild:
+            shutil.rmtree(corpus.index_dir, ignore_errors=True)
+            corpus.evict()
+            corpus.get_db()
+            size = os.path.getsize(os.path.join(corpus.index_dir, "index.faiss"))
+            print(f"  └─ rebuilt {corpus.index_dir} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    import sys
+    _report(rebuild="--rebuild" in sys.argv[1:])
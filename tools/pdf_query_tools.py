@@ -1,22 +1,48 @@
+# Size OpenMP/BLAS pools before torch and faiss are imported below
+from tools import thread_budget
+thread_budget.configure_env()
+
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain.agents import tool
+from langchain_core.tools import StructuredTool
 from langchain_huggingface import HuggingFaceEmbeddings
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.chains.question_answering import load_qa_chain
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.embeddings import CacheBackedEmbeddings
-from langchain.storage import LocalFileStore
 import os
+import json
+import hashlib
+import time
 import threading
 from typing import List
+from cachetools import LRUCache
+from tools.timing import stage
+from tools import query_log
+from tools import reranker
+from tools import ingest_cleanup
+from tools import pdf_extract
+from tools import hierarchy
+
 
+CORPORA_CONFIG = os.environ.get(
+    "NYAYA_CORPORA", os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpora.json")
+)
+# Soft cap on resident FAISS indexes; 0 disables eviction
+INDEX_BUDGET_MB = float(os.environ.get("NYAYA_INDEX_BUDGET_MB", "0"))
+# Bump when chunking or cleanup changes in a way that alters built indexes
+INDEX_FORMAT_VERSION = 1
+MANIFEST_NAME = "build.json"
+# "flat" or "hierarchical"; overrides each corpus' "retrieval" setting when set
+RETRIEVAL_MODE = os.environ.get("NYAYA_RETRIEVAL")
 
 _embed_lock = threading.Lock()
 _embeddings_model = None
-_db_constitution = None
-_db_bns = None
+_qa_llm = None
+
+# Query-keyed caches; warmed from the query log at startup
+_cache_lock = threading.Lock()
+_embed_cache = LRUCache(maxsize=int(os.environ.get("NYAYA_EMBED_CACHE_SIZE", "2048")))
+_retrieval_cache = LRUCache(maxsize=int(os.environ.get("NYAYA_RETRIEVAL_CACHE_SIZE", "2048")))
 
 def _get_embeddings():
     """Singleton embeddings to avoid re-instantiation per tool call."""
@@ -24,48 +50,188 @@ def _get_embeddings():
     if _embeddings_model is None:
         with _embed_lock:
             if _embeddings_model is None:
+                thread_budget.apply()
                 _embeddings_model = HuggingFaceEmbeddings(
                     model_name="sentence-transformers/all-mpnet-base-v2"
                 )
     return _embeddings_model
 
-def _load_or_build_faiss(index_dir: str, pdf_path: str):
+
+def _get_qa_llm():
+    """Shared LLM for the QA-chain tool variants."""
+    global _qa_llm
+    if _qa_llm is None:
+        with _embed_lock:
+            if _qa_llm is None:
+                _qa_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+    return _qa_llm
+
+
+def _embed_query(query: str):
+    """Embed a query, reusing the vector for repeated (normalized) queries."""
+    key = query_log.normalize(query)
+    with _cache_lock:
+        vector = _embed_cache.get(key)
+    if vector is not None:
+        query_log.note(cache="embed")
+        return vector
+    with stage("embed"), thread_budget.cpu_slot():
+        vector = _get_embeddings().embed_query(query)
+    with _cache_lock:
+        _embed_cache[key] = vector
+    return vector
+
+
+def _embed_queries(queries: list) -> list:
+    """Batched ``_embed_query``: all uncached queries go through the model in one pass."""
+    keys = [query_log.normalize(q) for q in queries]
+    with _cache_lock:
+        vectors = [_embed_cache.get(key) for key in keys]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        with stage("embed"), thread_budget.cpu_slot():
+            new_vectors = _get_embeddings().embed_documents([queries[i] for i in missing])
+        with _cache_lock:
+            for i, vector in zip(missing, new_vectors):
+                vectors[i] = vector
+                _embed_cache[keys[i]] = vector
+    return vectors
+
+
+def _chunk_id(doc) -> str:
+    doc_id = getattr(doc, "id", None)
+    if doc_id:
+        return str(doc_id)
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:12]
+
+
+def _new_faiss_index(index_type: str, dim: int, n: int):
+    """Create an empty FAISS index of the configured type."""
+    import faiss
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dim, 32)
+    if index_type == "ivf":
+        # Keep at least ~39 training points per list, as FAISS recommends
+        nlist = max(1, min(int(4 * n ** 0.5), n // 39))
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+    return faiss.IndexFlatL2(dim)
+
+
+def _extract_pages(pdf_path: str, extractor: str = None) -> list:
+    """Text of each PDF page (empty string for pages without text), via the page cache."""
+    with stage("extract"):
+        return pdf_extract.extract_pages(pdf_path, extractor)
+
+
+def _chunk_pages(pages: list, chunk_size: int, chunk_overlap: int, cleanup: bool = True) -> tuple:
+    """Split page texts into chunks, optionally stripping boilerplate and near-duplicates.
+
+    Returns ``(texts, cleanup_stats)``.
+    """
+    stats = {}
+    if cleanup:
+        pages, stats = ingest_cleanup.strip_boilerplate(pages)
+        raw_text = "\n".join(pages)
+    else:
+        raw_text = ''.join(pages)
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+    texts = text_splitter.split_text(raw_text)
+    if cleanup:
+        texts, dedupe_stats = ingest_cleanup.dedupe_chunks(texts)
+        stats.update(dedupe_stats)
+    return texts, stats
+
+
+def _build_manifest(chunk_size: int, chunk_overlap: int, index_type: str,
+                    cleanup: bool, extractor: str = None) -> dict:
+    """Everything an index build depends on, stored next to it as ``build.json``."""
+    ext = pdf_extract.get_extractor(extractor)
+    return {
+        "format": INDEX_FORMAT_VERSION,
+        "chunk_size": int(chunk_size),
+        "chunk_overlap": int(chunk_overlap),
+        "index_type": index_type,
+        "cleanup": bool(cleanup),
+        "extractor": ext.name,
+        "extractor_version": ext.version,
+    }
+
+
+def _read_manifest(index_dir: str) -> dict:
+    try:
+        with open(os.path.join(index_dir, MANIFEST_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _load_or_build_faiss(index_dir: str, pdf_path: str, chunk_size: int = 800,
+                         chunk_overlap: int = 200, index_type: str = "flat",
+                         embeddings_model=None, cleanup: bool = True, extractor: str = None,
+                         unit_levels=None):
     """Load FAISS index from disk, or build once and persist.
 
+    An index whose ``build.json`` does not match the requested settings is
+    rebuilt (or, without the PDF to rebuild from, loaded with a warning).
+    With ``unit_levels``, a fresh build also writes the hierarchical
+    retrieval sidecar, so hierarchical search never has to build it lazily.
     Returns a FAISS vectorstore.
     """
-    embeddings_model = _get_embeddings()
-    try:
-        return FAISS.load_local(index_dir, embeddings_model, allow_dangerous_deserialization=True)
-    except Exception:
-        reader = PdfReader(pdf_path)
-        raw_text = ''
-        for page in reader.pages:
-            text = page.extract_text()
-            if text:
-                raw_text += text
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=200,
-        )
-        texts = text_splitter.split_text(raw_text)
+    embeddings_model = embeddings_model or _get_embeddings()
+    manifest = _build_manifest(chunk_size, chunk_overlap, index_type, cleanup, extractor)
+    if os.path.exists(os.path.join(index_dir, "index.faiss")):
+        built = _read_manifest(index_dir)
+        changed = {k: (built.get(k), v) for k, v in manifest.items() if built.get(k) != v}
+        if not changed or not os.path.exists(pdf_path):
+            if changed:
+                print(f"⚠️ {index_dir} does not match its corpus settings {changed} (built, wanted) "
+                      f"and {pdf_path} is missing; serving it as built")
+            try:
+                return FAISS.load_local(index_dir, embeddings_model, allow_dangerous_deserialization=True)
+            except Exception:
+                pass
+        else:
+            print(f"🔁 Rebuilding {index_dir}: settings changed {changed} (built, wanted)")
 
-        db = FAISS.from_texts(texts, embeddings_model)
-        os.makedirs(os.path.dirname(index_dir), exist_ok=True)
-        db.save_local(index_dir)
-        return db
+    pages = _extract_pages(pdf_path, extractor)
+    texts, cleanup_stats = _chunk_pages(pages, chunk_size, chunk_overlap, cleanup)
 
+    if index_type == "flat":
+        db = FAISS.from_texts(texts, embeddings_model)
+    else:
+        import numpy as np
+        vectors = embeddings_model.embed_documents(texts)
+        index = _new_faiss_index(index_type, len(vectors[0]), len(vectors))
+        if not index.is_trained:
+            index.train(np.asarray(vectors, dtype="float32"))
+        db = FAISS(
+            embedding_function=embeddings_model,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        db.add_embeddings(list(zip(texts, vectors)))
+    os.makedirs(os.path.dirname(index_dir), exist_ok=True)
+    db.save_local(index_dir)
+    report_path = os.path.join(index_dir, "cleanup_report.json")
+    if cleanup_stats:
+        with open(report_path, "w") as f:
+            json.dump(cleanup_stats, f, indent=2)
+    elif os.path.exists(report_path):
+        os.remove(report_path)
+    if unit_levels:
+        hierarchy.load_or_build(index_dir, db, unit_levels)
+    # Written last: a build interrupted before this point is redone next time
+    with open(os.path.join(index_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return db
 
-@tool
-def indian_constitution_pdf_query(query: str) -> str:
-    """Retrieve relevant constitution passages. Returns plain text blocks joined for agent consumption."""
-    global _db_constitution
-    if _db_constitution is None:
-        _db_constitution = _load_or_build_faiss("db/faiss_index_constitution", "tools/data/constitution.pdf")
 
-    retriever = _db_constitution.as_retriever(search_kwargs={"k": 3})
-    docs = retriever.invoke(query)
+def _format_passages(docs) -> str:
     try:
         # docs may be a list of Document objects
         passages: List[str] = []
@@ -80,67 +246,199 @@ def indian_constitution_pdf_query(query: str) -> str:
         return str(docs)
 
 
-@tool
-def indian_laws_pdf_query(query: str) -> str:
-    """Retrieve relevant BNS (laws) passages. Returns plain text blocks joined for agent consumption."""
-    global _db_bns
-    if _db_bns is None:
-        _db_bns = _load_or_build_faiss("db/faiss_index_bns", "tools/data/BNS.pdf")
+class Corpus:
+    """A statute from ``corpora.json`` whose FAISS index is loaded on first use."""
 
-    retriever = _db_bns.as_retriever(search_kwargs={"k": 3})
-    docs = retriever.invoke(query)
-    try:
-        passages: List[str] = []
-        for d in docs:
-            content = getattr(d, "page_content", str(d))
-            if len(content) > 1200:
-                content = content[:1200] + "..."
-            passages.append(content.strip())
-        return "\n\n---\n".join(passages)
-    except Exception:
-        return str(docs)
+    def __init__(self, spec: dict):
+        self.name = spec["name"]
+        self.title = spec.get("title", self.name.title())
+        self.tool_name = spec.get("tool_name", f"{self.name}_pdf_query")
+        self.description = spec.get("description", f"Retrieve relevant {self.title} passages.")
+        self.pdf_path = spec["pdf"]
+        self.index_dir = spec["index_dir"]
+        self.chunk_size = int(spec.get("chunk_size", 800))
+        self.chunk_overlap = int(spec.get("chunk_overlap", 200))
+        self.index_type = spec.get("index_type", "flat")
+        self.cleanup = bool(spec.get("cleanup", True))
+        self.extractor = spec.get("extractor")
+        self.k = int(spec.get("k", 3))
+        # With reranking on, fetch this many from FAISS and keep the best k
+        self.rerank_candidates = int(spec.get("rerank_candidates", 12))
+        self.rerank_min_score = spec.get("rerank_min_score")
+        # Hierarchical retrieval narrows to the best Parts/Chapters before searching chunks
+        self.retrieval = RETRIEVAL_MODE or spec.get("retrieval", "flat")
+        self.unit_levels = spec.get("unit_levels", list(hierarchy.DEFAULT_LEVELS))
+        self.top_units = int(spec.get("top_units", hierarchy.DEFAULT_TOP_UNITS))
+        # Only preloaded corpora are warmed at startup; the rest load on first query
+        self.preload = bool(spec.get("preload", False))
+        self.last_used = 0.0
+        self.size_bytes = 0
+        self._db = None
+        self._hierarchy = None
+        self._lock = threading.Lock()
 
+    @property
+    def loaded(self) -> bool:
+        return self._db is not None
 
-# Enhanced versions with QA chain support (optional)
-@tool
-def indian_constitution_pdf_query_with_qa(query: str) -> str:
-    """Returns a processed answer from the Indian Constitution PDF using semantic search and QA chain"""
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-    embeddings_model = _get_embeddings()
+    def get_db(self):
+        """Return the vectorstore, loading (or building) it under this corpus' lock."""
+        self.last_used = time.monotonic()
+        db = self._db
+        if db is None:
+            with self._lock:
+                if self._db is None:
+                    db = _load_or_build_faiss(
+                        self.index_dir, self.pdf_path,
+                        self.chunk_size, self.chunk_overlap, self.index_type,
+                        cleanup=self.cleanup, extractor=self.extractor,
+                        unit_levels=self.unit_levels,
+                    )
+                    self.size_bytes = _index_size_bytes(self.index_dir)
+                    if self.retrieval == "hierarchical":
+                        self._hierarchy = hierarchy.load_or_build(self.index_dir, db, self.unit_levels)
+                        self.size_bytes += self._hierarchy.nbytes
+                    self._db = db
+                db = self._db
+            _enforce_budget(keep=self)
+        return db
 
-    db = _load_or_build_faiss("db/faiss_index_constitution", "tools/data/constitution.pdf")
+    def evict(self):
+        # Searches already holding the store keep it alive until they return
+        with self._lock:
+            self._db = None
+            self._hierarchy = None
 
-    # Get relevant documents
-    docs = db.similarity_search(query, k=4)
-    
-    # Use QA chain for better answers
-    try:
-        qa_chain = load_qa_chain(llm, chain_type="stuff")
-        result = qa_chain.run(input_documents=docs, question=query)
-        return result
-    except Exception as e:
-        # Fallback to simple retrieval if QA chain fails
-        return str(docs)
+    def search(self, query: str, k: int = None) -> list:
+        k = k or self.k
+        key = (self.name, query_log.normalize(query), k)
+        with _cache_lock:
+            docs = _retrieval_cache.get(key)
+        if docs is not None:
+            query_log.note(cache="retrieval")
+        else:
+            db = self.get_db()
+            vector = _embed_query(query)
+            fetch_k = max(k, self.rerank_candidates) if reranker.ENABLED else k
+            with stage("search"), thread_budget.cpu_slot():
+                docs = self._search_vectors(db, [vector], fetch_k)[0]
+            if fetch_k > k:
+                ids = [f"{self.name}:{_chunk_id(d)}" for d in docs]
+                docs = reranker.rerank(query, docs, ids, k, self.rerank_min_score)
+            with _cache_lock:
+                _retrieval_cache[key] = docs
+        query_log.note(chunks=[f"{self.name}:{_chunk_id(d)}" for d in docs])
+        return docs
 
+    def search_batch(self, queries: list, vectors: list, k: int = None) -> list:
+        """Batched ``search``: one FAISS call for all ``queries`` (pre-embedded as ``vectors``)."""
+        k = k or self.k
+        fetch_k = max(k, self.rerank_candidates) if reranker.ENABLED else k
+        db = self.get_db()
+        with stage("search"), thread_budget.cpu_slot():
+            batch_docs = self._search_vectors(db, vectors, fetch_k)
+        results = []
+        for query, docs in zip(queries, batch_docs):
+            if fetch_k > k:
+                ids = [f"{self.name}:{_chunk_id(d)}" for d in docs]
+                docs = reranker.rerank(query, docs, ids, k, self.rerank_min_score)
+            with _cache_lock:
+                _retrieval_cache[(self.name, query_log.normalize(query), k)] = docs
+            results.append(docs)
+        return results
 
-@tool
-def indian_laws_pdf_query_with_qa(query: str) -> str:
-    """Returns a processed answer from the BNS PDF using semantic search and QA chain"""
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-    embeddings_model = _get_embeddings()
+    def _search_vectors(self, db, vectors: list, fetch_k: int) -> list:
+        """Nearest chunks for each query vector, flat or coarse-to-fine per ``retrieval``."""
+        import numpy as np
+        tree = self._hierarchy
+        if tree is not None:
+            rows = [tree.search(db.index, v, fetch_k, self.top_units) for v in vectors]
+        else:
+            _, rows = db.index.search(np.asarray(vectors, dtype="float32"), fetch_k)
+        results = []
+        for row in rows:
+            docs = [db.docstore.search(db.index_to_docstore_id[int(i)]) for i in row if i != -1]
+            results.append([d for d in docs if hasattr(d, "page_content")])
+        return results
 
-    db = _load_or_build_faiss("db/faiss_index_bns", "tools/data/BNS.pdf")
+    def query(self, query: str) -> str:
+        return _format_passages(self.search(query))
 
-    # Get relevant documents
-    docs = db.similarity_search(query, k=4)
-    
-    # Use QA chain for better answers
-    try:
-        qa_chain = load_qa_chain(llm, chain_type="stuff")
-        result = qa_chain.run(input_documents=docs, question=query)
-        return result
-    except Exception as e:
-        # Fallback to simple retrieval if QA chain fails
-        return str(docs)
\ No newline at end of file
+    def query_with_qa(self, query: str) -> str:
+        docs = self.search(query, k=4)
+        # Use QA chain for better answers
+        try:
+            qa_chain = load_qa_chain(_get_qa_llm(), chain_type="stuff")
+            return qa_chain.run(input_documents=docs, question=query)
+        except Exception:
+            # Fallback to simple retrieval if QA chain fails
+            return str(docs)
+
+
+def _index_size_bytes(index_dir: str) -> int:
+    """Approximate resident size of a loaded index by its on-disk footprint."""
+    total = 0
+    for fname in ("index.faiss", "index.pkl"):
+        try:
+            total += os.path.getsize(os.path.join(index_dir, fname))
+        except OSError:
+            pass
+    return total
+
+
+def _enforce_budget(keep: Corpus = None):
+    """Evict least recently used indexes until the resident set fits the budget."""
+    if INDEX_BUDGET_MB <= 0:
+        return
+    budget = INDEX_BUDGET_MB * 1024 * 1024
+    loaded = [c for c in CORPORA.values() if c.loaded]
+    used = sum(c.size_bytes for c in loaded)
+    for corpus in sorted(loaded, key=lambda c: c.last_used):
+        if used <= budget:
+            break
+        if corpus is keep:
+            continue
+        print(f"Evicting {corpus.name} index ({corpus.size_bytes / 1e6:.1f} MB) to stay within budget")
+        corpus.evict()
+        used -= corpus.size_bytes
+
+
+def _load_registry(path: str = CORPORA_CONFIG) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        specs = json.load(f)
+    registry = {}
+    for spec in specs:
+        corpus = Corpus(spec)
+        if not os.path.exists(corpus.pdf_path) and not os.path.isdir(corpus.index_dir):
+            print(f"Skipping corpus {corpus.name}: neither {corpus.pdf_path} nor {corpus.index_dir} exists")
+            continue
+        registry[corpus.name] = corpus
+    return registry
+
+
+def _make_tool(corpus: Corpus, with_qa: bool = False):
+    def run(query: str) -> str:
+        return corpus.query_with_qa(query) if with_qa else corpus.query(query)
+
+    if with_qa:
+        return StructuredTool.from_function(
+            func=run,
+            name=f"{corpus.tool_name}_with_qa",
+            description=f"Returns a processed answer from the {corpus.title} PDF using semantic search and QA chain",
+        )
+    return StructuredTool.from_function(func=run, name=corpus.tool_name, description=corpus.description)
+
+
+CORPORA = _load_registry()
+TOOLS = [_make_tool(c) for c in CORPORA.values()]
+# Enhanced versions with QA chain support (optional, not given to the agent)
+QA_TOOLS = [_make_tool(c, with_qa=True) for c in CORPORA.values()]
+
+# Expose every generated tool as a module attribute, e.g.
+# pdf_query_tools.indian_constitution_pdf_query
+globals().update({t.name: t for t in TOOLS + QA_TOOLS})
+
+
+def get_tools() -> list:
+    """Retrieval tools for the agent, one per registered corpus."""
+    return list(TOOLS)
@@ -0,0 +1,205 @@
+"""Structured query log with a background writer, and log-driven cache warming.
+
+``agent.agent`` opens a record with ``begin()``; retrieval code adds the
+chunk IDs it returned and any cache hits with ``note()``; ``finish()`` hands
+the record to a daemon thread that appends it to rotating JSONL files under
+``NYAYA_QUERY_LOG_DIR``. Callers never wait on disk: when the in-memory
+queue is full the record is dropped and counted.
+
+``warm_caches()`` reads the recent log at startup and replays the most
+frequent queries so the embedding, retrieval and answer caches are hot
+right after a deploy.
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import Counter
+
+LOG_DIR = os.environ.get("NYAYA_QUERY_LOG_DIR", os.path.join("db", "query_log"))
+LOG_NAME = "queries.jsonl"
+MAX_BYTES = int(os.environ.get("NYAYA_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+BACKUP_COUNT = int(os.environ.get("NYAYA_QUERY_LOG_BACKUPS", "5"))
+WARM_TOP_N = int(os.environ.get("NYAYA_WARM_FROM_LOG", "25"))
+WARM_WINDOW_H = float(os.environ.get("NYAYA_WARM_WINDOW_H", "72"))
+
+_local = threading.local()
+_queue = queue.Queue(maxsize=10000)
+_writer = None
+_writer_lock = threading.Lock()
+dropped = 0
+
+
+def normalize(query: str) -> str:
+    """Cache/log key for a query: case- and whitespace-insensitive."""
+    return " ".join(query.lower().split())
+
+
+# -- per-request record -----------------------------------------------------
+
+def begin(query: str):
+    _local.t0 = time.perf_counter()
+    _local.record = {
+        "ts": time.time(),
+        "query": query,
+        "route": "agent",
+        "latency_ms": None,
+        "chunks": [],
+        "cache": {},
+    }
+
+
+def note(route: str = None, chunks: list = None, cache: str = None, prompt_tokens: int = None):
+    """Annotate the current request; a no-op outside ``begin``/``finish``."""
+    record = getattr(_local, "record", None)
+    if record is None:
+        return
+    if prompt_tokens is not None:
+        record.setdefault("prompt_tokens", []).append(prompt_tokens)
+    if route:
+        record["route"] = route
+    if chunks:
+        record["chunks"].extend(chunks)
+    if cache:
+        record["cache"][cache] = record["cache"].get(cache, 0) + 1
+
+
+def current_route():
+    record = getattr(_local, "record", None)
+    return record["route"] if record else None
+
+
+def finish(answer: str = None):
+    record = getattr(_local, "record", None)
+    if record is None:
+        return
+    _local.record = None
+    record["latency_ms"] = round(1000 * (time.perf_counter() - _local.t0), 1)
+    record["answer"] = answer
+    write(record)
+
+
+# -- background writer --------------------------------------------------------
+
+def write(record: dict):
+    global dropped
+    _ensure_writer()
+    try:
+        _queue.put_nowait(record)
+    except queue.Full:
+        dropped += 1
+
+
+def flush(timeout: float = 5.0):
+    """Wait (up to ``timeout``) for queued records to reach disk."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_writer_loop, name="nyaya-query-log", daemon=True)
+                _writer.start()
+
+
+def _rotate(path: str):
+    for i in range(BACKUP_COUNT - 1, 0, -1):
+        src, dst = f"{path}.{i}", f"{path}.{i + 1}"
+        if os.path.exists(src):
+            os.replace(src, dst)
+    os.replace(path, f"{path}.1")
+
+
+def _writer_loop():
+    path = os.path.join(LOG_DIR, LOG_NAME)
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < 256:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                for record in batch:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if os.path.getsize(path) > MAX_BYTES:
+                _rotate(path)
+        except OSError as e:
+            print(f"Query log write failed: {e}")
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+# -- cache warming --------------------------------------------------------------
+
+def read_recent(window_h: float = WARM_WINDOW_H) -> list:
+    """Records from the current and rotated log files newer than ``window_h`` hours."""
+    cutoff = time.time() - window_h * 3600
+    base = os.path.join(LOG_DIR, LOG_NAME)
+    records = []
+    for path in [base] + [f"{base}.{i}" for i in range(1, BACKUP_COUNT + 1)]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get("ts", 0) >= cutoff and record.get("query"):
+                        records.append(record)
+        except FileNotFoundError:
+            continue
+    return records
+
+
+def top_queries(records: list, n: int) -> list:
+    """Most frequent queries, each with its latest generated answer (if any).
+
+    Answers are taken only from records that generated them (``agent`` or
+    ``fallback``). An ``answer_cache`` record's timestamp is the time of the
+    hit, so re-priming from it would keep an old answer alive across
+    restarts past ``NYAYA_ANSWER_CACHE_TTL_S``.
+    """
+    counts = Counter()
+    latest = {}
+    for record in records:
+        key = normalize(record["query"])
+        counts[key] += 1
+        if record.get("answer") and record.get("route") in ("agent", "fallback"):
+            if key not in latest or record["ts"] > latest[key]["ts"]:
+                latest[key] = record
+    top = []
+    for key, _ in counts.most_common(n):
+        record = latest.get(key)
+        top.append({
+            "query": record["query"] if record else key,
+            "answer": record["answer"] if record else None,
+            "ts": record["ts"] if record else None,
+        })
+    return top
+
+
+def warm_caches(n: int = WARM_TOP_N, window_h: float = WARM_WINDOW_H) -> int:
+    """Pre-populate embedding, retrieval and answer caches from the query log."""
+    if n <= 0:
+        return 0
+    from tools import pdf_query_tools
+    import agent
+
+    entries = top_queries(read_recent(window_h), n)
+    for entry in entries:
+        for corpus in pdf_query_tools.CORPORA.values():
+            if corpus.preload or corpus.loaded:
+                corpus.search(entry["query"])
+        if entry["answer"]:
+            agent.prime_answer_cache(entry["query"], entry["answer"], entry["ts"])
+    return len(entries)
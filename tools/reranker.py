@@ -0,0 +1,70 @@
+"""Optional CPU cross-encoder reranking of retrieved passages.
+
+FAISS returns a wider candidate set cheaply; the cross-encoder rescoring
+all (query, passage) pairs in one batch picks the few passages that go
+back to the agent. Scores are cached per (query, chunk) so repeated and
+reformulated-but-identical queries skip the model entirely. Time spent here
+is recorded as the ``rerank`` stage, separate from ``embed``/``search``.
+
+Enabled with ``NYAYA_RERANK=1``; per-corpus candidate counts come from
+``rerank_candidates`` in ``corpora.json``.
+"""
+
+import os
+import threading
+from cachetools import LRUCache
+from tools.timing import stage
+from tools import thread_budget
+
+ENABLED = os.environ.get("NYAYA_RERANK", "0").lower() in ("1", "true", "yes")
+MODEL_NAME = os.environ.get("NYAYA_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Passages longer than this are truncated by the model anyway
+MAX_LENGTH = 512
+
+_model_lock = threading.Lock()
+_model = None
+_score_lock = threading.Lock()
+_scores = LRUCache(maxsize=int(os.environ.get("NYAYA_RERANK_CACHE_SIZE", "20000")))
+
+
+def _get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+                _model = CrossEncoder(MODEL_NAME, max_length=MAX_LENGTH, device="cpu")
+    return _model
+
+
+def rerank(query: str, docs: list, ids: list, top_n: int, min_score: float = None) -> list:
+    """Return the ``top_n`` best of ``docs`` for ``query``, best first.
+
+    ``ids`` are stable chunk IDs parallel to ``docs``, used as score-cache
+    keys. With ``min_score`` set, passages scoring below it are dropped
+    (the best one is always kept) so clearly irrelevant text never reaches
+    the prompt.
+    """
+    if not docs:
+        return docs
+    key_query = " ".join(query.lower().split())
+    scores = [None] * len(docs)
+    with _score_lock:
+        for i, chunk_id in enumerate(ids):
+            scores[i] = _scores.get((key_query, chunk_id))
+
+    missing = [i for i, s in enumerate(scores) if s is None]
+    with stage("rerank"):
+        if missing:
+            pairs = [(query, docs[i].page_content) for i in missing]
+            with thread_budget.cpu_slot():
+                predicted = _get_model().predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+            with _score_lock:
+                for i, score in zip(missing, predicted):
+                    scores[i] = float(score)
+                    _scores[(key_query, ids[i])] = scores[i]
+
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:top_n]
+        if min_score is not None:
+            order = order[:1] + [i for i in order[1:] if scores[i] >= min_score]
+    return [docs[i] for i in order]
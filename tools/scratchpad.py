@@ -0,0 +1,106 @@
+"""ReAct agent with a compacted ``{agent_scratchpad}``.
+
+``create_react_agent`` resends every earlier Thought/Action/Observation in
+full on each iteration, so with 1200-char passages the prompt grows
+roughly quadratically over a run. This builds the same agent (same prompt,
+stop sequence and output parser) but formats the scratchpad compactly:
+
+* a repeated tool call with the same input, or an observation identical to
+  an earlier one, is replaced by a reference to that step;
+* observations older than the last ``keep_full`` steps are cut down to a
+  short snippet of each retrieved passage, unless a later step refers back
+  to them.
+
+Each iteration logs its estimated prompt tokens and the tokens saved
+against the uncompacted scratchpad.
+"""
+
+import os
+from langchain.agents.format_scratchpad import format_log_to_str
+from langchain.agents.output_parsers import ReActSingleInputOutputParser
+from langchain.tools.render import render_text_description
+from langchain_core.runnables import RunnableLambda
+from tools import query_log
+
+KEEP_FULL = int(os.environ.get("NYAYA_SCRATCHPAD_KEEP_FULL", "1"))
+SNIPPET_CHARS = int(os.environ.get("NYAYA_SCRATCHPAD_SNIPPET_CHARS", "240"))
+PASSAGE_SEPARATOR = "\n\n---\n"
+
+
+def _estimate_tokens(chars: int) -> int:
+    # ~4 characters per token for English legal text; avoids a tokenizer call
+    return max(0, chars) // 4
+
+
+def _snippets(observation: str, snippet_chars: int) -> str:
+    """Keep the opening of each passage, where the Article/Section heading is."""
+    passages = []
+    for passage in observation.split(PASSAGE_SEPARATOR):
+        passage = passage.strip()
+        if len(passage) > snippet_chars:
+            passage = passage[:snippet_chars].rsplit(" ", 1)[0] + " …"
+        passages.append(passage)
+    return PASSAGE_SEPARATOR.join(passages)
+
+
+def compact_scratchpad(intermediate_steps, keep_full: int = KEEP_FULL,
+                       snippet_chars: int = SNIPPET_CHARS) -> str:
+    """Drop-in replacement for ``format_log_to_str`` with compaction."""
+    # First pass: which earlier step each repeat points to. A step that a
+    # later one refers back to stays in full, since the reference says its
+    # result is above.
+    seen_calls = {}
+    seen_observations = {}
+    refs = []
+    for step, (action, observation) in enumerate(intermediate_steps, start=1):
+        observation = str(observation)
+        call = (action.tool, str(action.tool_input).strip().lower())
+        if call in seen_calls:
+            refs.append(("call", seen_calls[call]))
+        elif observation in seen_observations:
+            refs.append(("result", seen_observations[observation]))
+        else:
+            seen_calls[call] = step
+            seen_observations[observation] = step
+            refs.append(None)
+    referenced = {ref[1] for ref in refs if ref}
+
+    thoughts = ""
+    last_full = len(intermediate_steps) - keep_full
+    for step, ((action, observation), ref) in enumerate(zip(intermediate_steps, refs), start=1):
+        thoughts += action.log
+        observation = str(observation)
+        if ref and ref[0] == "call":
+            observation = (
+                f"[Same call as step {ref[1]}; its result is above. "
+                "Use it or search with a different input.]"
+            )
+        elif ref:
+            observation = f"[Same result as step {ref[1]}.]"
+        elif step <= last_full and step not in referenced:
+            observation = _snippets(observation, snippet_chars)
+        thoughts += f"\nObservation: {observation}\nThought: "
+    return thoughts
+
+
+def create_compact_react_agent(llm, tools, prompt, keep_full: int = KEEP_FULL,
+                               snippet_chars: int = SNIPPET_CHARS):
+    """Equivalent of ``create_react_agent`` using ``compact_scratchpad``."""
+    prompt = prompt.partial(
+        tools=render_text_description(list(tools)),
+        tool_names=", ".join(t.name for t in tools),
+    )
+    llm_with_stop = llm.bind(stop=["\nObservation"])
+
+    def _build_prompt(inputs: dict):
+        steps = inputs["intermediate_steps"]
+        scratchpad = compact_scratchpad(steps, keep_full, snippet_chars)
+        prompt_value = prompt.invoke({**inputs, "agent_scratchpad": scratchpad})
+
+        tokens = _estimate_tokens(len(prompt_value.to_string()))
+        saved = _estimate_tokens(len(format_log_to_str(steps)) - len(scratchpad))
+        query_log.note(prompt_tokens=tokens)
+        print(f"ReAct iteration {len(steps) + 1}: ~{tokens} prompt tokens (~{saved} saved by compaction)")
+        return prompt_value
+
+    return RunnableLambda(_build_prompt) | llm_with_stop | ReActSingleInputOutputParser()
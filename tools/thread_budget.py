@@ -0,0 +1,130 @@
+"""Central CPU thread budget for torch, FAISS/OpenMP and request concurrency.
+
+By default torch (mpnet embeddings) and faiss-cpu each size their own
+intra-op/OpenMP pools to every core, and Streamlit adds a thread per
+session on top, so a few concurrent queries oversubscribe the CPU and tail
+latency spikes. One profile decides how the cores are split:
+
+* ``latency``    – few concurrent CPU ops, each gets several threads;
+* ``throughput`` – one thread per op, as many concurrent ops as cores;
+* ``balanced``   – in between (default).
+
+"Concurrent requests" here means requests doing CPU work at the same time:
+query embedding, FAISS search and reranking take a ``cpu_slot()`` first.
+Agent runs as a whole are bound by Gemini I/O and are admitted separately
+(``admission.py``), so many of them can be in flight while only a few hold
+a CPU slot.
+
+``NYAYA_THREAD_PROFILE`` picks the profile; ``NYAYA_CPUS``,
+``NYAYA_TORCH_THREADS``, ``NYAYA_TORCH_INTEROP_THREADS``,
+``NYAYA_FAISS_THREADS`` and ``NYAYA_REQUEST_CONCURRENCY`` override single
+values. ``configure_env()`` must run before torch/faiss are imported (it
+sets the OpenMP/BLAS environment); ``apply()`` then sets the runtime pools.
+"""
+
+import os
+import threading
+
+PROFILES = ("latency", "balanced", "throughput")
+
+_apply_lock = threading.Lock()
+_applied = False
+_slots = None
+
+
+def available_cpus() -> int:
+    """Cores this process may use (respects CPU affinity, e.g. container cpusets)."""
+    override = os.environ.get("NYAYA_CPUS")
+    if override:
+        return max(1, int(override))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def resolve(profile: str = None, cpus: int = None) -> dict:
+    """Thread counts for ``profile``; pure, so benchmarks can call it without torch."""
+    profile = profile or os.environ.get("NYAYA_THREAD_PROFILE", "balanced")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown thread profile {profile!r}; choose from {PROFILES}")
+    cpus = cpus or available_cpus()
+
+    if profile == "latency":
+        requests = max(1, cpus // 4)
+    elif profile == "throughput":
+        requests = cpus
+    else:
+        requests = max(1, cpus // 2)
+    per_request = max(1, cpus // requests)
+
+    budget = {
+        "profile": profile,
+        "cpus": cpus,
+        "request_concurrency": requests,
+        "torch_threads": per_request,
+        "torch_interop_threads": 1,
+        "faiss_threads": per_request,
+    }
+    for key, env in (
+        ("request_concurrency", "NYAYA_REQUEST_CONCURRENCY"),
+        ("torch_threads", "NYAYA_TORCH_THREADS"),
+        ("torch_interop_threads", "NYAYA_TORCH_INTEROP_THREADS"),
+        ("faiss_threads", "NYAYA_FAISS_THREADS"),
+    ):
+        if os.environ.get(env):
+            budget[key] = max(1, int(os.environ[env]))
+    return budget
+
+
+def configure_env(budget: dict = None) -> dict:
+    """Size OpenMP/BLAS pools via the environment; explicit user settings win."""
+    budget = budget or resolve()
+    threads = str(budget["torch_threads"])
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, threads)
+    # The HF tokenizers pool would be a third pool competing for the same cores
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    return budget
+
+
+def apply(budget: dict = None) -> dict:
+    """Set torch and FAISS thread pools once per process."""
+    global _applied
+    budget = budget or resolve()
+    with _apply_lock:
+        if _applied:
+            return budget
+        configure_env(budget)
+        try:
+            import torch
+            torch.set_num_threads(budget["torch_threads"])
+            try:
+                torch.set_num_interop_threads(budget["torch_interop_threads"])
+            except RuntimeError:
+                # Only settable before torch runs any parallel work
+                pass
+        except ImportError:
+            pass
+        try:
+            import faiss
+            faiss.omp_set_num_threads(budget["faiss_threads"])
+        except ImportError:
+            pass
+        _applied = True
+    print(
+        f"Thread budget ({budget['profile']}, {budget['cpus']} CPUs): "
+        f"{budget['request_concurrency']} concurrent CPU ops, torch {budget['torch_threads']}"
+        f"/{budget['torch_interop_threads']} threads, FAISS {budget['faiss_threads']} threads"
+    )
+    return budget
+
+
+def cpu_slot() -> threading.BoundedSemaphore:
+    """Semaphore bounding concurrent CPU-heavy ops to the budget; use as ``with cpu_slot():``."""
+    global _slots
+    if _slots is None:
+        with _apply_lock:
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(resolve()["request_concurrency"])
+    return _slots
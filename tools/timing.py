@@ -0,0 +1,39 @@
+"""Per-request stage timings (embed, search, llm, ...) collected per thread.
+
+Code paths wrap their work in ``stage("name")``; callers that care about the
+breakdown (benchmarks, the query log) call ``start()`` before a request and
+``collect()`` after it. Outside a recording the context manager is a no-op
+apart from one ``perf_counter`` call.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def start():
+    _local.stages = {}
+
+
+def collect() -> dict:
+    stages = getattr(_local, "stages", None) or {}
+    _local.stages = None
+    return stages
+
+
+def record(name: str, seconds: float):
+    """Add ``seconds`` to a stage, for work timed outside a ``stage`` block."""
+    stages = getattr(_local, "stages", None)
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
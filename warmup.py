@@ -1,33 +1,20 @@
 #!/usr/bin/env python3
-"""Warmup script to preload models and indexes on container startup."""
+"""Warmup script to preload models and indexes.
+
+Run at image build time (``python warmup.py --build``) to bake the embedding
+model and FAISS indexes into the image, or by hand to warm a local checkout.
+The serving process warms itself via ``startup.py``.
+"""
 
 import sys
 import os
 
-# Add parent directory to path
-sys.path.insert(0, '/app')
+# Allow running from any working directory
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-print("🔥 Starting warmup...")
+from startup import warm
 
-try:
-    # Import and trigger model loading
-    print("  ├─ Loading PDF query tools...")
-    from tools import pdf_query_tools
-    
-    # Trigger embeddings and FAISS loading
-    print("  ├─ Warming up Constitution index...")
-    pdf_query_tools.indian_constitution_pdf_query.invoke("preamble")
-    
-    print("  ├─ Warming up BNS Laws index...")
-    pdf_query_tools.indian_laws_pdf_query.invoke("section 1")
-    
-    # Trigger agent executor creation
-    print("  ├─ Initializing agent...")
-    from agent import _get_agent_executor
-    _get_agent_executor()
-    
-    print("✅ Warmup complete! System ready for queries.")
-    
-except Exception as e:
-    print(f"⚠️  Warmup warning: {e}")
-    print("System will warm up on first query instead.")
+if __name__ == "__main__":
+    # --build: no API key at build time, so skip the Gemini-backed agent
+    ok = warm(include_agent="--build" not in sys.argv[1:])
+    sys.exit(0 if ok else 1)